@@ -1,13 +1,47 @@
 import os
+import io
 import csv
+import atexit
+import shutil
+import threading
 import tempfile
-from flask import Flask, request, render_template, redirect, url_for, flash, session
+import hashlib
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, render_template, redirect, url_for, flash, session, jsonify, make_response
 from flask_session import Session
 import json
 from werkzeug.utils import secure_filename
-import requests
 import xml.etree.ElementTree as ET
-from gdrive_helper import download_tsv_from_gdrive, upload_tsv_to_gdrive
+from gdrive_helper import (download_tsv_from_gdrive, upload_tsv_to_gdrive, get_tsv_revision,
+                           download_journal_from_gdrive, upload_journal_to_gdrive, get_journal_revision,
+                           download_snapshot_from_gdrive, upload_snapshot_to_gdrive,
+                           DRIVE_JOURNAL_FILE_ID, DRIVE_SNAPSHOT_FILE_ID)
+from journal import (change, append_changes, read_changes, apply_changes, journal_size, clear_journal,
+                     discard_changes, JOURNAL_FILE, JOURNAL_COMPACT_BYTES)
+from catalog import CatalogCache
+from interprocess import FileLock, SharedState
+from records import as_movie, sort_movies
+import snapshot
+from snapshot import SNAPSHOT_FILE
+from sqlite_store import SqliteCatalog
+from search_index import SearchIndex
+from fuzzy import TrigramIndex, FUZZY_MIN_SCORE, normalize_title
+from bulk_import import parse_title_list, classify_matches
+from export import EXPORT_FORMATS, export_chunks, gzip_chunks
+from batch_edit import BATCH_ACTIONS, batch_changes
+from tmdb_client import TMDBClient
+from ttl_cache import TTLCache
+from prefetch import PrefetchStore
+from image_prep import prepare_image
+from jobs import JobRunner
+from compression import compress_response
+from session_store import start_session_sweeper
+import metrics
+from metrics import timed
+from cachelib.file import FileSystemCache
+from datetime import timedelta
+from drive_sync import WriteBehindUploader
 from google import genai
 from google.genai import types
 import string
@@ -22,55 +56,432 @@ SITE_PASSWORD = os.getenv("SITE_PASSWORD", "letmein")
 # Temporary local TSV file - sync to Google Drive for persistence
 TSV_FILE = 'Movies.tsv'
 
+# 'tsv' rewrites Movies.tsv on every change; 'journal' appends changes to Movies.journal
+# and only rewrites the TSV snapshot when the journal is compacted; 'sqlite' keeps the
+# catalog in an indexed SQLite database and exports the TSV only for the Drive backup
+CATALOG_STORAGE = os.getenv("CATALOG_STORAGE", "tsv")
+if CATALOG_STORAGE == 'journal' and not DRIVE_JOURNAL_FILE_ID:
+    print("CATALOG_STORAGE=journal needs DRIVE_JOURNAL_FILE_ID; falling back to tsv storage")
+    CATALOG_STORAGE = 'tsv'
+
+store = SqliteCatalog() if CATALOG_STORAGE == 'sqlite' else None
+
+# Keep a compact binary copy of the catalog next to Movies.tsv (needs msgspec; CATALOG_SNAPSHOT=0
+# turns it off). SQLite storage keeps its own database instead.
+USE_SNAPSHOT = store is None and snapshot.available() and os.getenv("CATALOG_SNAPSHOT", "1") != "0"
+
+# Gunicorn workers share the files above. Every write to them and every Drive download
+# happens under this lock as a read-modify-write of the latest local copy.
+catalog_lock = FileLock('Movies.lock')
+# Held for a whole upload so one worker uploads at a time. Uploads only take catalog_lock
+# briefly to copy the files (see stage_upload), so saves don't wait for Drive.
+upload_lock = FileLock('Movies.upload.lock')
+UPLOAD_SUFFIX = '.upload'
+# Shared between workers: the Drive revision the local files are based on, and whether the
+# TSV snapshot (journal storage) has been rewritten since it was last uploaded (tsv_saves
+# counts the rewrites, so an upload can tell whether another one happened meanwhile)
+sync_state = SharedState('Movies.sync.json', {'revision': None, 'tsv_dirty': False, 'tsv_saves': 0})
+# Changes (journal records) saved locally but not yet uploaded, replayed onto Drive's copy
+# if another instance changed it in the meantime
+PENDING_FILE = 'Movies.pending'
+# Upload attempts per sync when Drive keeps changing underneath us
+UPLOAD_CONFLICT_RETRIES = int(os.getenv("UPLOAD_CONFLICT_RETRIES", "3"))
+
 # Gemini API Setup (You will plug your key here)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 tmdb_key = os.getenv("tmdb_key")
+tmdb = TMDBClient(tmdb_key)
+
+# Concurrent TMDB requests per worker process (still subject to the client's rate limit)
+TMDB_WORKERS = int(os.getenv("TMDB_WORKERS", "8"))
+tmdb_executor = ThreadPoolExecutor(max_workers=TMDB_WORKERS, thread_name_prefix='tmdb')
+# Upper bound on result pages read per title search (20 results per page)
+TMDB_SEARCH_MAX_PAGES = int(os.getenv("TMDB_SEARCH_MAX_PAGES", "5"))
+# Stop reading pages once this many matches are found (0 reads all TMDB_SEARCH_MAX_PAGES).
+# Used by every title search: the image wizard and its prefetch, add-by-title and bulk import.
+TMDB_SEARCH_MAX_RESULTS = int(os.getenv("TMDB_SEARCH_MAX_RESULTS", "0")) or None
+
+# TMDB responses cached in memory and in a SQLite file shared by all workers
+# (set TMDB_CACHE_DB to an empty string to keep the cache in memory only)
+TMDB_CACHE_DB = os.getenv("TMDB_CACHE_DB", "tmdb_cache.db") or None
+TMDB_CACHE_SIZE = int(os.getenv("TMDB_CACHE_SIZE", "2048"))
+details_cache = TTLCache(TMDB_CACHE_SIZE, float(os.getenv("TMDB_DETAILS_TTL", str(7 * 24 * 3600))),
+                         disk_path=TMDB_CACHE_DB, namespace='details')
+search_cache = TTLCache(TMDB_CACHE_SIZE, float(os.getenv("TMDB_SEARCH_TTL", str(24 * 3600))),
+                        disk_path=TMDB_CACHE_DB, namespace='search')
+# Titles Gemini extracted, keyed by the SHA-256 of the uploaded image (same cache file)
+titles_cache = TTLCache(256, float(os.getenv("IMAGE_TITLES_TTL", str(30 * 24 * 3600))),
+                        disk_path=TMDB_CACHE_DB, namespace='image_titles')
+
+# One Gemini client for the whole process, created on first use
+gemini_client = None
+gemini_client_lock = threading.Lock()
+
+def get_gemini_client():
+    global gemini_client
+    with gemini_client_lock:
+        if gemini_client is None:
+            gemini_client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version': 'v1'})
+        return gemini_client
 
 def load_tsv():
+    if USE_SNAPSHOT and snapshot.snapshot_is_current(SNAPSHOT_FILE, TSV_FILE):
+        movies = snapshot.read_snapshot(SNAPSHOT_FILE)
+        if movies is not None:
+            return movies
     if not os.path.exists(TSV_FILE):
         return []
-    with open(TSV_FILE, newline='', encoding='utf-8') as f:
-        return list(csv.DictReader(f, delimiter='\t'))
-
-def save_tsv(movies):
+    # Read once: the md5 and mtime must describe the same bytes that get parsed,
+    # even if another worker replaces the TSV meanwhile
+    with open(TSV_FILE, 'rb') as f:
+        data = f.read()
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+    movies = list(csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), delimiter='\t'))
+    if USE_SNAPSHOT:
+        # The next cold start decodes this instead of parsing the TSV again
+        snapshot.write_snapshot(movies, hashlib.md5(data).hexdigest(), source_mtime_ns=mtime_ns)
+    return movies
+
+def write_tsv(movies, with_snapshot=True):
     fieldnames = ['ID', 'Title', 'Year', 'Runtime', 'Actors', 'Notes']
-    with open(TSV_FILE, 'w', newline='', encoding='utf-8') as f:
+    # Write to a temp file and swap it in, so a background upload never sees a partial file
+    tmp_file = TSV_FILE + '.tmp'
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter='\t')
         writer.writeheader()
         for movie in movies:
             writer.writerow(movie)
-    upload_tsv_to_gdrive()
+    os.replace(tmp_file, TSV_FILE)
+    if USE_SNAPSHOT and with_snapshot:
+        snapshot.write_snapshot(movies, snapshot.file_md5(TSV_FILE))
+
+@timed('save')
+def save_tsv(movies, compact=False):
+    """Write the TSV (emptying the journal when compacting) and schedule an upload"""
+    with catalog_lock:
+        write_tsv(movies)
+        if compact:
+            clear_journal()
+        sync_state.update(tsv_dirty=True, tsv_saves=sync_state.get('tsv_saves') + 1)
+        catalog.replace(movies)
+    uploader.schedule()
+
+def commit_changes(changes):
+    """Persist a list of change records (see journal.change) in one write and one upload.
+
+    The changes are applied to the latest local catalog under catalog_lock, so
+    writes from other worker processes are never overwritten.
+    """
+    for record in changes:
+        if 'movie' in record:
+            record['movie'] = as_movie(record['movie'])
+    with catalog_lock:
+        if store is not None:
+            catalog.ensure_fresh()
+            store.apply(changes)
+            append_changes(changes, PENDING_FILE)
+            catalog.mark_changed()
+            uploader.schedule()
+            return
+        movies, old_version = catalog.movies_with_version()
+        movies = apply_changes(movies, changes)
+        if CATALOG_STORAGE != 'journal':
+            save_tsv(movies)
+        else:
+            append_changes(changes)
+            if journal_size() >= JOURNAL_COMPACT_BYTES:
+                # Compact: the new snapshot already contains every journaled change
+                save_tsv(movies, compact=True)
+            else:
+                catalog.replace(movies)
+                uploader.schedule()
+        append_changes(changes, PENDING_FILE)
+        search_index.apply_changes(changes, old_version, catalog.version)
+
+@timed('parse')
+def load_catalog():
+    if store is not None:
+        store.import_tsv(TSV_FILE)
+        return store.all()
+    movies = load_tsv()
+    if CATALOG_STORAGE == 'journal':
+        movies = apply_changes(movies, read_changes())
+    return movies
+
+@timed('drive')
+def download_catalog():
+    """Replace the local files with Drive's copy unless they already match it or hold unsent changes"""
+    with catalog_lock:
+        if has_pending_changes():
+            # Another worker's edits haven't been uploaded; its uploader merges them with Drive
+            return
+        revision = known_revision()
+        if revision is not None and revision == sync_state.get('revision') and os.path.exists(TSV_FILE):
+            # Another worker already downloaded this revision
+            return
+        download_catalog_files()
+        sync_state.update(revision=revision, tsv_dirty=False)
+
+def download_catalog_files():
+    if not download_snapshot():
+        download_tsv_from_gdrive()
+    if CATALOG_STORAGE == 'journal':
+        download_journal_from_gdrive()
 
-def extract_titles_from_image(image_path):
-    client = genai.Client(api_key=GEMINI_API_KEY, http_options={'api_version': 'v1'})
+def has_pending_changes():
+    return journal_size(PENDING_FILE) > 0
 
+def local_stamp():
+    """Changes whenever any worker writes the local catalog files"""
+    paths = (store.path, store.path + '-wal') if store is not None else (TSV_FILE, JOURNAL_FILE)
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamp.append(None)
+        else:
+            stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+# Last known Drive revisions of the TSV and (journal storage only) the journal
+drive_revisions = {'tsv': None, 'journal': None}
+
+def known_revision():
+    """The catalog revision made of the last Drive revisions we saw (see get_catalog_revision)"""
+    if CATALOG_STORAGE != 'journal' or drive_revisions['tsv'] is None:
+        return drive_revisions['tsv']
+    return f"{drive_revisions['tsv']}:{drive_revisions['journal']}"
+
+@timed('drive')
+def get_catalog_revision():
+    drive_revisions['tsv'] = get_tsv_revision()
+    if CATALOG_STORAGE == 'journal':
+        drive_revisions['journal'] = get_journal_revision()
+    return known_revision()
+
+def download_snapshot():
+    """Fetch the binary snapshot instead of the TSV when Drive has one made from the current TSV"""
+    if not (USE_SNAPSHOT and DRIVE_SNAPSHOT_FILE_ID and drive_revisions['tsv']):
+        return False
+    try:
+        download_snapshot_from_gdrive()
+    except Exception as e:
+        print("Error downloading snapshot:", e)
+        return False
+    # Drive's md5Checksum of the TSV is what the snapshot records as its source
+    if snapshot.snapshot_source(SNAPSHOT_FILE) != drive_revisions['tsv']:
+        return False
+    movies = snapshot.read_snapshot(SNAPSHOT_FILE)
+    if movies is None:
+        return False
+    # Keep Movies.tsv in step for readers that only know the TSV (the Discord bot, sqlite import),
+    # then date the snapshot like it so load_tsv still takes the snapshot
+    write_tsv(movies, with_snapshot=False)
+    tsv_mtime = os.stat(TSV_FILE).st_mtime_ns
+    os.utime(SNAPSHOT_FILE, ns=(tsv_mtime, tsv_mtime))
+    return True
+
+def upload_snapshot(path=SNAPSHOT_FILE):
+    """Best effort: readers check the snapshot against the TSV revision, so a stale one is harmless"""
+    if not (USE_SNAPSHOT and DRIVE_SNAPSHOT_FILE_ID and os.path.exists(path)):
+        return
+    try:
+        upload_snapshot_to_gdrive(path)
+    except Exception as e:
+        print("Error uploading snapshot:", e)
+
+@timed('drive_upload')
+def upload_catalog():
+    """Upload the local catalog if Drive is still at the revision it was based on.
+
+    Drive has no compare-and-swap, so the revision is checked just before uploading;
+    when another instance changed Drive first, its copy is downloaded, our pending
+    changes are replayed on top and the check is repeated.
+
+    The files are copied under catalog_lock and uploaded from the copies, so saves
+    made during the upload stay pending for the next one.
+    """
+    with upload_lock:
+        for attempt in range(UPLOAD_CONFLICT_RETRIES):
+            with catalog_lock:
+                state = sync_state.read()
+                pending_size = journal_size(PENDING_FILE)
+                stage_upload(state['tsv_dirty'])
+            remote = get_catalog_revision()
+            if remote is not None and remote == state['revision'] and not pending_size and not state['tsv_dirty']:
+                # Another worker already uploaded everything we saved
+                return remote
+            if remote is not None and state['revision'] is not None and remote != state['revision']:
+                with catalog_lock:
+                    rebase_pending_changes(remote)
+                continue
+            revision = push_catalog(state['tsv_dirty'])
+            with catalog_lock:
+                # Only what was staged reached Drive; later saves stay dirty/pending
+                sync_state.update(revision=revision,
+                                  tsv_dirty=sync_state.get('tsv_saves') != state['tsv_saves'])
+                discard_changes(pending_size, PENDING_FILE)
+            return revision
+    raise RuntimeError("Drive copy of the catalog kept changing; will retry the upload")
+
+def stage_upload(tsv_dirty):
+    """Copy the files push_catalog uploads (call with catalog_lock held)"""
+    if store is not None:
+        store.export_tsv(TSV_FILE)
+    paths = []
+    if CATALOG_STORAGE != 'journal' or tsv_dirty:
+        paths.append(TSV_FILE)
+        if USE_SNAPSHOT and DRIVE_SNAPSHOT_FILE_ID:
+            paths.append(SNAPSHOT_FILE)
+    if CATALOG_STORAGE == 'journal':
+        paths.append(JOURNAL_FILE)
+    for path in paths:
+        if os.path.exists(path):
+            shutil.copyfile(path, path + UPLOAD_SUFFIX)
+        elif os.path.exists(path + UPLOAD_SUFFIX):
+            os.remove(path + UPLOAD_SUFFIX)
+
+def push_catalog(tsv_dirty):
+    """Upload the staged copies and return the new catalog revision"""
+    if CATALOG_STORAGE != 'journal':
+        drive_revisions['tsv'] = upload_tsv_to_gdrive(TSV_FILE + UPLOAD_SUFFIX)
+        upload_snapshot(SNAPSHOT_FILE + UPLOAD_SUFFIX)
+        return known_revision()
+    # The snapshot must land before the (possibly just cleared) journal
+    if tsv_dirty:
+        drive_revisions['tsv'] = upload_tsv_to_gdrive(TSV_FILE + UPLOAD_SUFFIX)
+        upload_snapshot(SNAPSHOT_FILE + UPLOAD_SUFFIX)
+    journal_copy = JOURNAL_FILE + UPLOAD_SUFFIX
+    if not os.path.exists(journal_copy):
+        open(journal_copy, 'w').close()
+    drive_revisions['journal'] = upload_journal_to_gdrive(journal_copy)
+    return known_revision()
+
+def rebase_pending_changes(revision):
+    """Take Drive's copy (at ``revision``) and re-apply the changes we haven't uploaded"""
+    print("Drive catalog changed since our last sync; merging local changes")
+    pending = read_changes(PENDING_FILE)
+    download_catalog_files()
+    if store is not None:
+        store.import_tsv(TSV_FILE)
+        store.apply(pending)
+        catalog.mark_changed()
+    elif CATALOG_STORAGE == 'journal':
+        # Drive's journal plus ours, on top of Drive's snapshot
+        append_changes(pending)
+        catalog.mark_changed()
+    else:
+        write_tsv(apply_changes(load_tsv(), pending))
+        catalog.mark_changed()
+    sync_state.update(revision=revision, tsv_dirty=False)
+
+# Saves are pushed to Drive in the background; bursts of edits become one upload
+uploader = WriteBehindUploader(upload_catalog, on_synced=lambda revision: catalog.set_revision(revision))
+atexit.register(uploader.flush, float(os.getenv("UPLOAD_SHUTDOWN_TIMEOUT", "30")))
+
+# Shared in-memory copy of the catalog, refreshed only when the Drive file changes or
+# another worker writes the local files
+catalog = CatalogCache(load_catalog, download_catalog, get_catalog_revision,
+                       hold=lambda: uploader.pending or has_pending_changes(),
+                       write_lock=catalog_lock, local_stamp=local_stamp)
+
+if has_pending_changes():
+    # A previous process saved changes it never uploaded
+    uploader.schedule()
+
+# Token index for /search, kept in step with the catalog (not used with sqlite storage)
+search_index = SearchIndex()
+
+def find_movie(movie_id):
+    if store is not None:
+        catalog.ensure_fresh()
+        return store.get(movie_id)
+    return catalog.by_id().get(str(movie_id))
+
+def find_movies(movie_ids):
+    """{ID: movie} for the IDs present in the catalog"""
+    if store is not None:
+        catalog.ensure_fresh()
+        return store.get_many(movie_ids)
+    by_id = catalog.by_id()
+    return {str(movie_id): by_id[str(movie_id)] for movie_id in movie_ids if str(movie_id) in by_id}
+
+def find_movie_by_title(title):
+    if store is not None:
+        catalog.ensure_fresh()
+        return store.find_by_title(title)
+    return next((g for g in catalog.movies() if g['Title'].lower() == title.lower()), None)
+
+@timed('search')
+def search_movies(title='', year='', runtime='', actors='', notes=''):
+    """Movies matching every non-empty field (lowercased substrings; runtime within 10 minutes)"""
+    if store is not None:
+        catalog.ensure_fresh()
+        return store.search(title, year, runtime, actors, notes)
+
+    movies, version = catalog.movies_with_version()
+    if search_index.version != version:
+        search_index.rebuild(movies, version)
+    return search_index.search(title, year, runtime, actors, notes)
+
+# Fuzzy title lookup for OCR'd and typed titles, rebuilt when the catalog changes
+title_matcher = TrigramIndex(key=lambda movie: movie['Title'])
+# A fuzzy match at least this similar is treated as the same title
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", "0.6"))
+
+def similar_movies(title, k=5, min_score=FUZZY_MIN_SCORE):
+    """Up to k (score, movie) pairs whose titles are closest to title, best first"""
+    movies, version = catalog.movies_with_version()
+    if title_matcher.version != version:
+        title_matcher.rebuild(movies, version)
+    return title_matcher.top(title, k, min_score)
+
+def extract_titles_from_image(image_path, notify=flash):
+    """Ask Gemini for the movie titles in an image. Status messages go to notify (flash by default)"""
     with open(image_path, "rb") as f:
         image_bytes = f.read()
 
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    cached = titles_cache.get(image_hash)
+    if cached is not None:
+        notify("Reused titles from a previous upload of this image: " + ", ".join(cached), "info")
+        return list(cached)
+
+    client = get_gemini_client()
+    image_bytes, mime_type = prepare_image(image_bytes)
+
     def try_model(model_name):
-        response = client.models.generate_content(
-            model=model_name,
-            contents=[
-                types.Part.from_bytes(
-                    data=image_bytes,
-                    mime_type="image/jpeg"
-                ),
-                "What are the titles of all the movies in this image? Return the titles only, with no other text, separated by line breaks."
-            ]
-        )
+        with timed('gemini'):
+            try:
+                response = client.models.generate_content(
+                    model=model_name,
+                    contents=[
+                        types.Part.from_bytes(
+                            data=image_bytes,
+                            mime_type=mime_type
+                        ),
+                        "What are the titles of all the movies in this image? Return the titles only, with no other text, separated by line breaks."
+                    ]
+                )
+            except Exception:
+                metrics.gemini_calls.inc(model=model_name, outcome='error')
+                raise
+        metrics.gemini_calls.inc(model=model_name, outcome='ok')
         return response
 
     try:
         response = try_model("gemini-2.5-flash")
-        flash("Used model: gemini-2.5-flash", "info")
+        notify("Used model: gemini-2.5-flash", "info")
     except Exception as e:
-        flash(f"gemini-2.5-flash failed with error: {e}. Trying gemini-2.5-flash-lite...", "warning")
+        notify(f"gemini-2.5-flash failed with error: {e}. Trying gemini-2.5-flash-lite...", "warning")
+        metrics.gemini_fallbacks.inc()
         try:
             response = try_model("gemini-2.5-flash-lite")
-            flash("Used model: gemini-2.5-flash-lite", "info")
+            notify("Used model: gemini-2.5-flash-lite", "info")
         except Exception as e2:
-            flash(f"Both models failed. Last error: {e2}", "error")
+            notify(f"Both models failed. Last error: {e2}", "error")
             return []
 
     titles_text = response.text.strip()
@@ -80,82 +491,113 @@ def extract_titles_from_image(image_path):
         title = re.sub('’', '\'', title)
         title = re.sub('  ', ' ', title)
     if titles:
-        flash(f"Gemini extracted {len(titles)} title(s): " + ", ".join(titles), "info")
+        titles_cache.set(image_hash, titles)
+        notify(f"Gemini extracted {len(titles)} title(s): " + ", ".join(titles), "info")
     else:
-        flash("Gemini returned no titles from the image.", "warning")
+        notify("Gemini returned no titles from the image.", "warning")
 
     return titles
 
 def strip_punctuation(text):
     return text.translate(str.maketrans('', '', string.punctuation))
 
-def search_tmdb_movies(title):
-    """Search TMDB for movies by title. Return a list of potential matches."""
-    url = "https://api.themoviedb.org/3/search/movie"
+def _search_tmdb_page(title, page):
+    """Fetch one page of TMDB search results; returns the decoded JSON or None on error"""
+    params = {
+        "query": title,
+        "include_adult": False,
+        "page": page
+    }
+    response = tmdb.get("/search/movie", params=params)
+    if response.status_code != 200:
+        print("Error:", response.status_code)
+        return None
+    return response.json()
+
+def _match_rank(title_clean, movie_title_clean):
+    """0 for an exact title, 1 for a prefix, 2 for any other substring, None for no match"""
+    if title_clean == movie_title_clean:
+        return 0
+    if movie_title_clean.startswith(title_clean):
+        return 1
+    if title_clean in movie_title_clean:
+        return 2
+    return None
+
+@timed('tmdb')
+def search_tmdb_movies(title, max_pages=TMDB_SEARCH_MAX_PAGES, max_results=TMDB_SEARCH_MAX_RESULTS):
+    """Search TMDB for movies by title. Return a list of potential matches.
+
+    At most max_pages pages are read; pages after the first are fetched
+    concurrently once page 1 reports total_pages. With max_results, pages are
+    fetched in waves and the search stops as soon as that many matches are
+    found. Matches are ranked exact, prefix, then substring, keeping TMDB's
+    page order within each group.
+    """
+    cache_key = f"{title}|{max_pages}|{max_results}"
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return [dict(m) for m in cached]
 
     title_clean = strip_punctuation(title.lower())
-    matches = []
-
-    page = 1
-    total_pages = 1  # will be updated after first request
-
-    while page <= total_pages:
-        params = {
-            "api_key": tmdb_key,
-            "query": title,
-            "include_adult": False,
-            "page": page
-        }
-
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            print("Error:", response.status_code)
-            break
-
-        data = response.json()
-        total_pages = data.get("total_pages", 1)
-        results = data.get("results", [])
+    ranked = []
+    complete = True
 
-        if not results:
-            break
-
-        for movie in results:
+    def collect(data, page):
+        for order, movie in enumerate(data.get("results", [])):
             movie_title = movie.get("title", "")
             movie_title_clean = strip_punctuation(movie_title.lower().strip())
             movie_title_clean = re.sub('  ', ' ', movie_title_clean)
-            year = movie.get("release_date", "").split("-")[0]
+            year = (movie.get("release_date") or "").split("-")[0]
 
-            if title_clean in movie_title_clean:
-                matches.append({
+            rank = _match_rank(title_clean, movie_title_clean)
+            if rank is not None:
+                ranked.append(((rank, page, order), {
                     "id": movie.get("id"),
                     "title": movie_title,
                     "release_date": year
-                })
+                }))
+
+    first = _search_tmdb_page(title, 1)
+    if first is None:
+        return []
+    collect(first, 1)
+    last_page = min(first.get("total_pages", 1), max_pages)
+
+    pages = list(range(2, last_page + 1))
+    wave = TMDB_WORKERS if max_results else len(pages)
+    while pages and not (max_results and len(ranked) >= max_results):
+        batch, pages = pages[:wave], pages[wave:]
+        for page, data in zip(batch, tmdb_executor.map(lambda p: _search_tmdb_page(title, p), batch)):
+            if data is None:
+                complete = False
+                continue
+            collect(data, page)
 
-        page += 1
+    ranked.sort(key=lambda item: item[0])
+    matches = [match for _, match in ranked]
+    if max_results:
+        matches = matches[:max_results]
 
+    # Don't remember a result list cut short by an error
+    if complete:
+        search_cache.set(cache_key, matches)
     return matches
 
 def get_tmdb_movie_details(movie_id):
     """Fetch detailed info for a TMDb movie by ID"""
-    
-    # 1. Get basic movie details
-    movie_url = f"https://api.themoviedb.org/3/movie/{movie_id}"
-    params = {"api_key": tmdb_key}
-    r = requests.get(movie_url, params=params)
+    cached = details_cache.get(str(movie_id))
+    if cached is not None:
+        return dict(cached)
+
+    # Details and cast in one request
+    r = tmdb.get(f"/movie/{movie_id}", params={"append_to_response": "credits"})
     if r.status_code != 200:
         print("Error fetching movie details:", r.status_code)
         return None
     movie_data = r.json()
-    
-    # 2. Get movie credits to fetch actors
-    credits_url = f"https://api.themoviedb.org/3/movie/{movie_id}/credits"
-    r_credits = requests.get(credits_url, params=params)
-    if r_credits.status_code != 200:
-        print("Error fetching movie credits:", r_credits.status_code)
-        return None
-    credits_data = r_credits.json()
-    
+    credits_data = movie_data.get("credits") or {}
+
     # Extract cast names
     actors = [actor["name"] for actor in credits_data.get("cast", [])]
     actors_str = ", ".join(actors)  # All actors separated by commas
@@ -169,33 +611,91 @@ def get_tmdb_movie_details(movie_id):
         "Actors": actors_str,
         "Notes": ""  # leave blank for now
     }
-    
-    return details
-
-def sort_movies(movies, sort_by):
-    key_funcs = {
-        'title': lambda g: g.get('Title', '').lower(),
-        'year': lambda g: int(g.get('Year') or 0),
-        'runtime': lambda g: g.get('Runtime') or 0,
-        'actors': lambda g: g.get('Actors', '').lower(),
-        'notes': lambda g: g.get('Notes', '').lower(),
-    }
 
-    if sort_by in key_funcs:
-        return sorted(movies, key=key_funcs[sort_by])
-    else:
-        return movies  # return as-is for default order
+    details_cache.set(str(movie_id), details)
+    return dict(details)
+
+@timed('tmdb')
+def get_tmdb_movies_details(movie_ids):
+    """Fetch details for several movies concurrently; results (or None) follow the input order"""
+    def fetch(movie_id):
+        try:
+            return get_tmdb_movie_details(movie_id)
+        except Exception as e:
+            print("Error fetching movie details:", e)
+            return None
+    return list(tmdb_executor.map(fetch, movie_ids))
+
+# Gemini calls run here instead of holding a request worker for the model latency
+jobs = JobRunner()
+# Queued jobs are dropped on exit; the worker's stale rows then read as failed
+atexit.register(jobs.shutdown)
+
+# TMDB searches for every title of an image import, started as soon as Gemini answers.
+# Separate from tmdb_executor, because each search fans its pages out onto that pool.
+prefetched_searches = PrefetchStore(search_tmdb_movies, max_workers=int(os.getenv("PREFETCH_WORKERS", "4")))
 
 # --- Session ---
 
 app.config['SECRET_KEY'] = 'your-existing-secret-key'
 
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_FILE_DIR'] = './flask_session'  # folder will be created
+SESSION_FILE_DIR = './flask_session'  # folder will be created
+# Session files expire after this long without a write, and at most this many are kept
+SESSION_LIFETIME = timedelta(days=int(os.getenv("SESSION_LIFETIME_DAYS", "7")))
+SESSION_FILE_THRESHOLD = int(os.getenv("SESSION_FILE_THRESHOLD", "2000"))
+
+session_cache = FileSystemCache(SESSION_FILE_DIR, threshold=SESSION_FILE_THRESHOLD)
+
+app.config['SESSION_TYPE'] = 'cachelib'
+app.config['SESSION_CACHELIB'] = session_cache
 app.config['SESSION_PERMANENT'] = False
 app.config['SESSION_USE_SIGNER'] = True
+app.config['PERMANENT_SESSION_LIFETIME'] = SESSION_LIFETIME
 
 Session(app)
+start_session_sweeper(SESSION_FILE_DIR)
+
+# Registered first, so the timing covers the other hooks (after_request hooks run in reverse)
+app.before_request(metrics.start_request)
+app.after_request(lambda response: metrics.finish_request(request, response))
+metrics.instrument_templates(app)
+
+@app.after_request
+def compress(response):
+    return compress_response(request, response)
+
+# --- Metrics ---
+
+TMDB_CACHES = {'details': details_cache, 'search': search_cache, 'image_titles': titles_cache}
+
+metrics.callback('movie_tmdb_requests_total', 'HTTP requests sent to TMDB (including retries)', 'counter', (),
+                 lambda: [((), tmdb.requests_sent)])
+metrics.callback('movie_tmdb_retries_total', 'TMDB requests retried after 429/5xx or a network error', 'counter', (),
+                 lambda: [((), tmdb.retries)])
+metrics.callback('movie_cache_lookups_total', 'TMDB and image-title cache lookups by result', 'counter',
+                 ('cache', 'result'),
+                 lambda: [((name, result), cache.stats()[key])
+                          for name, cache in TMDB_CACHES.items()
+                          for result, key in (('hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'))])
+metrics.callback('movie_cache_entries', 'Entries held in memory per cache', 'gauge', ('cache',),
+                 lambda: [((name,), cache.stats()['size']) for name, cache in TMDB_CACHES.items()])
+
+# Prometheus scrapes this without a session; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def bearer_token_matches(token):
+    """Whether the request's Authorization header carries this bearer token, compared in constant time"""
+    sent = request.headers.get('Authorization', '')
+    return hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if METRICS_TOKEN and not bearer_token_matches(METRICS_TOKEN):
+        return "Unauthorized", 401
+    response = make_response(metrics.render_metrics())
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
 
 # --- Routes ---
 
@@ -216,6 +716,91 @@ def logout():
     flash("Logged out.", "info")
     return redirect(url_for('login'))
 
+# Rows rendered with the list page; the rest are fetched from /rows as the user scrolls
+INDEX_PAGE_SIZE = int(os.getenv("INDEX_PAGE_SIZE", "200"))
+ROWS_MAX_LIMIT = 1000
+
+def search_results(query):
+    """Re-run a search stored in the session (see search()) against the current catalog"""
+    filtered = search_movies(query['title'], query['year'], query['runtime'], query['actors'], query['notes'])
+
+    # Sort filtered if sort_by present
+    if query.get('sort'):
+        filtered = sort_movies(filtered, query['sort'])
+    return filtered
+
+def list_view(view, sort_by, reverse=False, offset=0, limit=INDEX_PAGE_SIZE):
+    """One window of the movie list, in the order the page shows it.
+
+    The 'index' view sorts like index() (with direction); the 'search' view
+    sorts like search(). A search stored in the session takes precedence over the
+    catalog. Returns (rows, total count, searched).
+    """
+    if 'search_query' in session:
+        movies = search_results(session['search_query'])
+        searched = True
+    elif store is not None:
+        # Let SQLite do the sorting through its indexes
+        catalog.ensure_fresh()
+        return store.sorted(sort_by, reverse, limit=limit, offset=offset), store.count(), False
+    else:
+        # Cached per-column ordering; rebuilt only when the catalog changes
+        movies = catalog.sorted(sort_by, reverse if view == 'index' else False)
+        return movies[offset:offset + limit], len(movies), False
+
+    if view == 'search':
+        movies = sort_movies(movies, sort_by)
+    else:
+        movies = sort_movies(movies, sort_by, reverse)
+    return movies[offset:offset + limit], len(movies), searched
+
+def _deploy_version():
+    """Hash of the templates and this module, so a deploy that changes the pages changes every ETag"""
+    digest = hashlib.sha1(os.getenv("RENDER_GIT_COMMIT", "").encode())
+    paths = [os.path.abspath(__file__)]
+    for folder, _, names in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        paths.extend(os.path.join(folder, name) for name in sorted(names))
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+DEPLOY_VERSION = _deploy_version()
+
+def list_etag(*parts):
+    """ETag for a list response: deploy version, catalog content, the user's search results and the view parameters.
+
+    None when there are flashed messages waiting, since those make the page one-off.
+    """
+    if session.get('_flashes'):
+        return None
+    digest = hashlib.sha1(DEPLOY_VERSION.encode())
+    digest.update(catalog.fingerprint().encode())
+    digest.update(json.dumps(session.get('search_query'), sort_keys=True).encode())
+    digest.update(repr(parts).encode())
+    return digest.hexdigest()
+
+def not_modified(etag):
+    """A 304 response if the client already has this version, else None"""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def conditional(body, etag):
+    """Attach validators so the next identical request can be answered with a 304"""
+    response = make_response(body)
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+def next_offset(offset, rows, count):
+    end = offset + len(rows)
+    return end if end < count else None
+
 @app.route('/')
 def index():
     if not session.get('logged_in'):
@@ -225,30 +810,106 @@ def index():
     direction = request.args.get('dir', 'asc')
     reverse = (direction == 'desc')
 
-    if 'search_results' in session:
-        movies = json.loads(session['search_results'])  # load filtered movies
-        searched = True
+    etag = list_etag('index', sort_by, direction, INDEX_PAGE_SIZE)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
+    movies, count, searched = list_view('index', sort_by, reverse)
+
+    return conditional(render_template('index.html', movies=movies, searched=searched, sort_by=sort_by, direction=direction, count=count,
+                                       rows_view='index', next_offset=next_offset(0, movies, count)), etag)
+
+@app.route('/rows')
+def rows():
+    """JSON slice of the current list (catalog or search results) for infinite scrolling"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'not logged in'}), 401
+
+    view = request.args.get('view', 'index')
+    sort_by = request.args.get('sort', 'title' if view == 'index' else None)
+    reverse = request.args.get('dir') == 'desc'
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', INDEX_PAGE_SIZE)), 1), ROWS_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+
+    etag = list_etag('rows', view, sort_by, reverse, offset, limit)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    movies, count, searched = list_view(view, sort_by, reverse, offset, limit)
+    return conditional(jsonify({
+        'rows': [dict({key: movie.get(key, '') for key in ('ID', 'Title', 'Year', 'Runtime', 'Actors', 'Notes')},
+                      edit_url=url_for('edit', title=movie['Title'])) for movie in movies],
+        'count': count,
+        'searched': searched,
+        'next_offset': next_offset(offset, movies, count),
+    }), etag)
+
+# Scripts pulling /export can send "Authorization: Bearer <EXPORT_TOKEN>" instead of logging in
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
+
+@app.route('/export')
+def export():
+    """Stream the catalog (or, with scope=search, the current search) as TSV, CSV or JSON Lines"""
+    token_ok = EXPORT_TOKEN and bearer_token_matches(EXPORT_TOKEN)
+    if not (session.get('logged_in') or token_ok):
+        return redirect(url_for('login'))
+
+    fmt = request.args.get('format', 'tsv')
+    if fmt not in EXPORT_FORMATS:
+        return f"Unknown format '{fmt}'; use one of {', '.join(EXPORT_FORMATS)}", 400
+    sort_by = request.args.get('sort')
+    reverse = request.args.get('dir') == 'desc'
+
+    # Only the list of records is materialized; the body is serialized as it is sent
+    if request.args.get('scope') == 'search' and 'search_query' in session:
+        movies = search_results(session['search_query'])
+        if sort_by:
+            movies = sort_movies(movies, sort_by, reverse)
     else:
-        download_tsv_from_gdrive()
-        movies = load_tsv()
-        searched = False
-    count = len(movies)
+        movies = catalog.sorted(sort_by, reverse)
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    body = export_chunks(movies, fmt)
+    headers = {'Content-Disposition': f'attachment; filename=movies.{extension}', 'Vary': 'Accept-Encoding'}
+    if request.args.get('gzip') != '0' and request.accept_encodings['gzip']:
+        body = gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype=mimetype, headers=headers)
 
-    if sort_by:
-        if sort_by == 'title':
-            movies.sort(key=lambda g: g['Title'].lower() if g['Title'] else '', reverse=reverse)
-        elif sort_by == 'year':
-            movies.sort(key=lambda g: float(g['Year']) if g['Year'] else 0, reverse=reverse)
-        elif sort_by == 'runtime':
-            movies.sort(key=lambda g: float(g['Runtime']) if g['Runtime'] else 0, reverse=reverse)
-        elif sort_by == 'actors':
-            movies.sort(key=lambda g: g['Actors'].lower() if g['Actors'] else '', reverse=reverse)
-        elif sort_by == 'notes':
-            movies.sort(key=lambda g: g['Notes'].lower() if g['Notes'] else '', reverse=reverse)
 
-    return render_template('index.html', movies=movies, searched=searched, sort_by=sort_by, direction=direction, count=count)
+def save_upload(file):
+    """Save an uploaded image under a unique temp name (jobs from several users may overlap)"""
+    filename = secure_filename(file.filename)
+    fd, temp_path = tempfile.mkstemp(suffix='-' + filename)
+    with os.fdopen(fd, 'wb') as f:
+        file.save(f)
+    return temp_path
+
+def run_title_extraction(progress, temp_path):
+    """Job body for the image routes: Gemini titles plus the messages to flash afterwards"""
+    messages = []
 
+    def notify(message, category='message'):
+        messages.append([message, category])
+        progress(message)
+
+    progress("Reading titles from the image")
+    try:
+        titles = extract_titles_from_image(temp_path, notify=notify)
+    finally:
+        os.remove(temp_path)
+    return {'titles': titles, 'messages': messages}
+
+def job_started(job_id):
+    """Answer a job submission: JSON clients get the job ID, browsers the progress page"""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+    return redirect(url_for('job_page', job_id=job_id))
 
 @app.route('/upload-image', methods=['POST'])
 def upload_image():
@@ -264,23 +925,24 @@ def upload_image():
         flash("No selected file", "error")
         return redirect(url_for('index'))
 
-    filename = secure_filename(file.filename)
-    temp_path = os.path.join(tempfile.gettempdir(), filename)
-    file.save(temp_path)
+    temp_path = save_upload(file)
+    return job_started(jobs.submit('upload-image', run_title_extraction, temp_path))
 
-    titles = extract_titles_from_image(temp_path)
+def resume_upload_image(result):
+    titles = result['titles']
     for title in titles:
         title = re.sub('’', '\'', title)
     if not titles:
         flash("No titles detected in image", "error")
         return redirect(url_for('index'))
 
-    download_tsv_from_gdrive()
-    movies = load_tsv()
-
     # Queue titles not already in the TSV
     session['pending_titles'] = titles
     session['selected_movies'] = []
+    if session.get('import_id'):
+        prefetched_searches.discard(session['import_id'])
+    # Look every title up on TMDB now, while the user works through the wizard
+    session['import_id'] = prefetched_searches.start(titles)
     session.modified = True
 
     if not session['pending_titles']:
@@ -299,17 +961,9 @@ def process_next_title():
     selected_movies = session.get('selected_movies', [])
 
     if not pending_titles:
-        # When done, prepare 'pending_movies' for confirmation
-        # Fetch details for all selected movies
-        pending_movies = []
-        for movie_id in selected_movies:
-            details = get_tmdb_movie_details(movie_id)
-            if details:
-                pending_movies.append({'original_title': details['Title'], 'matches': [details]})
-        session['pending_movies'] = pending_movies
-
-        # Clear pending_titles and selected_movies
+        # When done, clear pending_titles; confirm_add_all reads selected_movies
         session.pop('pending_titles', None)
+        prefetched_searches.discard(session.pop('import_id', None))
         # session.pop('selected_movies', None)
         session.modified = True
 
@@ -332,16 +986,8 @@ def process_next_title():
                 return redirect(url_for('process_next_title'))
             else:
                 # Same end-of-queue behavior as before
-                pending_movies = []
-                for movie_id in selected_movies:
-                    details = get_tmdb_movie_details(movie_id)
-                    if details:
-                        pending_movies.append({
-                            'original_title': details['Title'],
-                            'matches': [details]
-                        })
-                session['pending_movies'] = pending_movies
                 session.pop('pending_titles', None)
+                prefetched_searches.discard(session.pop('import_id', None))
                 session.modified = True
 
                 return redirect(url_for('confirm_add_all'))
@@ -360,23 +1006,18 @@ def process_next_title():
             if pending_titles:
                 return redirect(url_for('process_next_title'))
             else:
-                # Prepare 'pending_movies' for confirmation immediately
-                pending_movies = []
-                for movie_id in selected_movies:
-                    details = get_tmdb_movie_details(movie_id)
-                    if details:
-                        pending_movies.append({'original_title': details['Title'], 'matches': [details]})
-                session['pending_movies'] = pending_movies
-
-                # Clear pending_titles and selected_movies since done
+                # Clear pending_titles since done; confirm_add_all reads selected_movies
                 session.pop('pending_titles', None)
+                prefetched_searches.discard(session.pop('import_id', None))
                 # session.pop('selected_movies', None)
                 session.modified = True
 
                 return redirect(url_for('confirm_add_all'))
 
     # GET request or POST with no selection: search matches
-    matches = search_tmdb_movies(current_title)
+    matches = prefetched_searches.get(session.get('import_id'), current_title)
+    if matches is None:
+        matches = search_tmdb_movies(current_title)
 
     if not matches:
         flash(f"Could not find '{current_title}' on TMDb.", "warning")
@@ -398,6 +1039,33 @@ def process_next_title():
     # Multiple matches: render selection page
     return render_template('choose_many_movies.html', matches=matches, original_title=current_title)
 
+def add_movies_by_id(movie_ids, notify=flash):
+    """Fetch TMDB details for the IDs and add the new ones in a single commit"""
+    existing_ids = {str(g['ID']) for g in catalog.movies()}
+    newly_added = 0
+    old_titles = []
+    changes = []
+    for details in get_tmdb_movies_details(movie_ids):
+        if not details:
+            continue
+
+        if str(details['ID']) not in existing_ids:
+            changes.append(change('add', details))
+            newly_added += 1
+            existing_ids.add(details['ID'])
+        else:
+            old_title = details['Title']
+            old_titles.append(old_title)
+
+    if changes:
+        commit_changes(changes)
+    if old_titles:
+            notify(
+                f"{', '.join(old_titles)} already in the database.",
+                "info"
+            )
+    notify(f"Added {newly_added} new movies to the database.", "success")
+
 @app.route('/confirm-add-all', methods=['GET', 'POST'])
 def confirm_add_all():
     if not session.get('logged_in'):
@@ -409,31 +1077,7 @@ def confirm_add_all():
         return redirect(url_for('index'))
 
     if request.method == 'POST':
-        movies = load_tsv()
-        existing_ids = {str(g['ID']) for g in movies}
-        newly_added = 0
-        old_titles = []
-        for movie_id in selected_movie_ids:
-            details = get_tmdb_movie_details(movie_id)
-
-            if not details:
-                continue
-
-            if str(details['ID']) not in existing_ids:
-                movies.insert(0, details)
-                newly_added += 1
-                existing_ids.add(details['ID'])
-            else:
-                old_title = details['Title']
-                old_titles.append(old_title)
-
-        save_tsv(movies)
-        if old_titles:
-                flash(
-                    f"{', '.join(old_titles)} already in the database.",
-                    "info"
-                )
-        flash(f"Added {newly_added} new movies to the database.", "success")
+        add_movies_by_id(selected_movie_ids)
 
         # Clear session data
         session.pop('pending_titles', None)
@@ -443,11 +1087,7 @@ def confirm_add_all():
         return redirect(url_for('index'))
 
     # GET: show all selected movies details for final confirmation
-    detailed_movies = []
-    for movie_id in selected_movie_ids:
-        details = get_tmdb_movie_details(movie_id)
-        if details:
-            detailed_movies.append(details)
+    detailed_movies = [details for details in get_tmdb_movies_details(selected_movie_ids) if details]
 
     return render_template('confirm_add_all.html', movies=detailed_movies)
 
@@ -457,8 +1097,8 @@ def add_by_title():
         return redirect(url_for('login'))
 
     session.pop('pending_titles', None)
+    prefetched_searches.discard(session.pop('import_id', None))
     session.pop('selected_movies', None)
-    session.pop('pending_movies', None)
 
     title = request.form.get('title')
     title = re.sub('(’|‘)', '\'', title)
@@ -466,11 +1106,15 @@ def add_by_title():
         flash("Please enter a movie title", "error")
         return redirect(url_for('index'))
 
-    movies = load_tsv()
-
     # Search BGG for multiple matches
     title = strip_punctuation(title.lower())
     title = title.strip()
+
+    # Warn about near-duplicates before going to TMDB; the user can still add it
+    similar = [movie['Title'] for score, movie in similar_movies(title, k=3, min_score=FUZZY_MATCH_THRESHOLD)]
+    if similar:
+        flash("Already in the database with a similar title: " + ", ".join(similar), "info")
+
     matches = search_tmdb_movies(title)
     if not matches:
         flash(f"No matches found for '{title}' on TMDb.", "error")
@@ -481,7 +1125,7 @@ def add_by_title():
         match_id = matches[0]["id"]
         match_id = str(matches[0]["id"])
 
-        if any(str(g['ID']) == match_id for g in movies):
+        if find_movie(match_id) is not None:
             flash(f"{title} is already in the database.", "info")
             return redirect(url_for('index'))
         else:
@@ -502,20 +1146,19 @@ def confirm_add():
             flash("Please select a movie to add.", "error")
             return redirect(url_for('index'))
 
-        details = get_tmdb_movie_details(selected_movie_id)
+        with timed('tmdb'):
+            details = get_tmdb_movie_details(selected_movie_id)
         if not details:
             flash("Could not retrieve movie details.", "error")
             return redirect(url_for('index'))
 
-        movies = load_tsv()
         movie_id = str(details.get("id") or details.get("ID"))
 
-        if any(g.get("ID") == movie_id for g in movies):
+        if find_movie(movie_id) is not None:
             flash(f"'{details['Title']}' is already in the database.", "info")
         else:
             details["ID"] = movie_id   # normalize before saving
-            movies.insert(0, details)
-            save_tsv(movies)
+            commit_changes([change('add', details)])
             flash(f"Added '{details['Title']}' to the database.", "success")
 
         return redirect(url_for('index'))
@@ -523,7 +1166,8 @@ def confirm_add():
     # GET request: maybe redirected here with ?selected_movie_id=
     selected_movie_id = request.args.get('selected_movie_id')
     if selected_movie_id:
-        details = get_tmdb_movie_details(selected_movie_id)
+        with timed('tmdb'):
+            details = get_tmdb_movie_details(selected_movie_id)
         if not details:
             flash("Could not retrieve movie details.", "error")
             return redirect(url_for('index'))
@@ -538,9 +1182,6 @@ def confirm_add():
 
 @app.route('/search', methods=['GET', 'POST'])
 def search():
-    download_tsv_from_gdrive()
-    movies = load_tsv()
-
     if request.method == 'POST':
         # Get sort param from query or default None
         sort_by = request.args.get('sort') or None
@@ -552,74 +1193,48 @@ def search():
         actors = request.form.get('actors', '').lower().strip()
         notes = request.form.get('notes', '').lower().strip()
 
-        def matches(movie):
-            if title and title not in movie['Title'].lower():
-                return False
-            if year and year not in movie['Year'].lower():
-                return False
-            if actors and actors not in movie.get('Actors', '').lower():
-                return False
-            if notes and notes not in movie.get('Notes', '').lower():
-                return False
-            if runtime:
-                try:
-                    if movie['Runtime']:
-                        w = float(movie['Runtime'])
-                        target = float(runtime)
-                        if not (target - 10 <= w <= target + 10):
-                            return False
-                except ValueError:
-                    return False
-            return True
-
-        filtered = [g for g in movies if matches(g)]
-
-        # Sort filtered if sort_by present
-        if sort_by:
-            filtered = sort_movies(filtered, sort_by)
-
-        # Store filtered results in session for consistency
-        session['search_results'] = json.dumps(filtered)
+        # Keep only the query in the session; the results are rebuilt from the catalog
+        query = {'title': title, 'year': year, 'runtime': runtime, 'actors': actors, 'notes': notes, 'sort': sort_by}
+        session['search_query'] = query
+        filtered = search_results(query)
 
         count = len(filtered)
+        movies = filtered[:INDEX_PAGE_SIZE]
 
-        return render_template('index.html', movies=filtered, sort_by=sort_by, searched=True, count=count)
+        return render_template('index.html', movies=movies, sort_by=sort_by, searched=True, count=count,
+                               rows_view='search', next_offset=next_offset(0, movies, count))
 
     # GET request shows all movies
     sort_by = request.args.get('sort')
-    if 'search_results' in session:
-        movies = json.loads(session['search_results'])
-        searched = True
-    else:
-        searched = False
+    etag = list_etag('search', sort_by, INDEX_PAGE_SIZE)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
-    if sort_by:
-        movies = sort_movies(movies, sort_by)
-    
-    count = len(movies)
+    movies, count, searched = list_view('search', sort_by)
 
-    return render_template('index.html', movies=movies, sort_by=sort_by, searched=searched, count=count)
+    return conditional(render_template('index.html', movies=movies, sort_by=sort_by, searched=searched, count=count,
+                                       rows_view='search', next_offset=next_offset(0, movies, count)), etag)
 
 @app.route('/edit/<title>', methods=['GET', 'POST'])
 def edit(title):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    download_tsv_from_gdrive()
-    movies = load_tsv()
-    movie = next((g for g in movies if g['Title'].lower() == title.lower()), None)
+    movie = find_movie_by_title(title)
     if movie is None:
         flash("movie not found", "error")
         return redirect(url_for('index'))
 
     if request.method == 'POST':
-        # Update movie info from form fields
+        # Update a copy; the cached record is replaced when the change is committed
+        movie = dict(movie)
         movie['Title'] = request.form.get('title', movie['Title'])
         movie['Year'] = request.form.get('year', movie['Year'])
         movie['Runtime'] = request.form.get('runtime', movie['Runtime'])
         movie['Actors'] = request.form.get('actors', movie['Actors'])
         movie['Notes'] = request.form.get('notes', movie['Notes'])
 
-        save_tsv(movies)
+        commit_changes([change('update', movie)])
         flash("movie updated successfully", "success")
         return redirect(url_for('index'))
 
@@ -629,20 +1244,70 @@ def edit(title):
 def delete_movie(movie_id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    movies = load_tsv()
-    updated_movies = [g for g in movies if str(g.get('ID')) != str(movie_id)]
-
-    if len(updated_movies) == len(movies):
+    if find_movie(movie_id) is None:
         flash("movie not found.", "error")
     else:
-        save_tsv(updated_movies)
+        commit_changes([change('delete', {'ID': movie_id})])
         flash("movie deleted successfully.", "success")
 
     return redirect(url_for('index'))
 
+# Largest selection a single batch request may change
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "5000"))
+
+@app.route('/batch', methods=['POST'])
+def batch_edit():
+    """Delete, set Notes on, or find/replace in the Notes of many movies with one save and one upload"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    action = request.form.get('action', '')
+    movie_ids = list(dict.fromkeys(request.form.getlist('ids')))
+    find = request.form.get('find', '')
+    every_movie = action == 'replace-notes' and request.form.get('all') == '1'
+
+    if action not in BATCH_ACTIONS:
+        flash("unknown batch action.", "error")
+        return redirect(url_for('index'))
+    if action == 'replace-notes' and not find:
+        flash("enter the text to find.", "error")
+        return redirect(url_for('index'))
+    if not movie_ids and not every_movie:
+        flash("select at least one movie.", "error")
+        return redirect(url_for('index'))
+    if len(movie_ids) > BATCH_MAX_IDS:
+        flash(f"select at most {BATCH_MAX_IDS} movies at a time.", "error")
+        return redirect(url_for('index'))
+
+    # Read and write under one lock, so edits another worker makes in between aren't overwritten
+    with catalog_lock:
+        if every_movie:
+            movies = catalog.movies()
+            missing = 0
+        else:
+            found = find_movies(movie_ids)
+            movies = [found[movie_id] for movie_id in movie_ids if movie_id in found]
+            missing = len(movie_ids) - len(movies)
+        changes = batch_changes(action, movies, notes=request.form.get('notes', ''),
+                                find=find, replace=request.form.get('replace', ''))
+        if changes:
+            commit_changes(changes)
+
+    flash(f"{len(changes)} movie{'s' if len(changes) != 1 else ''} {BATCH_ACTIONS[action]}.", "success")
+    if missing:
+        flash(f"{missing} selected movie{'s were' if missing != 1 else ' was'} not found.", "error")
+    return redirect(url_for('index'))
+
+@app.route('/sync-status')
+def sync_status():
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    status = uploader.status()
+    status['revision'] = catalog.revision
+    return jsonify(status)
+
 @app.route('/clear')
 def clear():
-    session.pop('search_results', None)
+    session.pop('search_query', None)
     return redirect(url_for('index'))
 
 @app.route('/search-by-image', methods=['POST'])
@@ -656,21 +1321,27 @@ def search_by_image():
     if file.filename == '':
         flash("No selected file", "error")
         return redirect(url_for('index'))
-    filename = secure_filename(file.filename)
-    temp_path = os.path.join(tempfile.gettempdir(), filename)
-    file.save(temp_path)
 
-    titles = extract_titles_from_image(temp_path)
+    temp_path = save_upload(file)
+    return job_started(jobs.submit('search-by-image', run_title_extraction, temp_path))
+
+def resume_search_by_image(result):
+    titles = result['titles']
     if not titles:
         flash("No titles detected in image", "error")
         return redirect(url_for('index'))
 
-    download_tsv_from_gdrive()
-    movies = load_tsv()
+    movies = catalog.movies()
     results = []
     lower_movies = {g['Title'].lower(): g for g in movies}
     for title in titles:
         g = lower_movies.get(title.lower())
+        if not g:
+            # OCR often gets a letter or some punctuation wrong; take a close enough match
+            found = similar_movies(title, k=1, min_score=FUZZY_MATCH_THRESHOLD)
+            if found:
+                g = found[0][1]
+                flash(f"{title} not found; showing closest match {g['Title']}", "info")
         if g:
             results.append(g)
         if not g:
@@ -681,5 +1352,156 @@ def search_by_image():
 
     return render_template('index.html', movies=results, searched=True)
 
+# --- Bulk import ---
+
+# Titles looked up on TMDB at once; each search also fans its pages out onto tmdb_executor
+BULK_IMPORT_WORKERS = int(os.getenv("BULK_IMPORT_WORKERS", "4"))
+BULK_IMPORT_MAX_TITLES = int(os.getenv("BULK_IMPORT_MAX_TITLES", "2000"))
+bulk_executor = ThreadPoolExecutor(max_workers=BULK_IMPORT_WORKERS, thread_name_prefix='bulk-import')
+
+def run_bulk_import(progress, entries):
+    """Job body for /bulk-import: skip titles already in the catalog, resolve the rest on TMDB.
+
+    When no title needs review the matches are added here; otherwise their details
+    are fetched (and cached) for the wizard's confirmation page.
+    """
+    progress("Checking the list against the catalog")
+    in_catalog = set()
+    for movie in catalog.movies():
+        key = normalize_title(movie['Title'])
+        in_catalog.add((key, ''))
+        in_catalog.add((key, str(movie['Year'])))
+    todo = [(title, year) for title, year in entries if (normalize_title(title), year) not in in_catalog]
+    skipped = len(entries) - len(todo)
+
+    def resolve(entry):
+        title, year = entry
+        try:
+            return classify_matches(title, year, search_tmdb_movies(title))
+        except Exception as e:
+            print("Error resolving", title, e)
+            return 'missing', None
+
+    accepted, review, missing = [], [], []
+    for done, ((title, year), (outcome, match)) in enumerate(zip(todo, bulk_executor.map(resolve, todo)), 1):
+        if outcome == 'accept':
+            if str(match['id']) not in accepted:
+                accepted.append(str(match['id']))
+        elif outcome == 'review':
+            review.append(title)
+        else:
+            missing.append(f"{title} ({year})" if year else title)
+        if done % 10 == 0 or done == len(todo):
+            progress(f"Looked up {done} of {len(todo)} titles on TMDB")
+
+    messages = [[f"Imported list: {len(accepted)} matched, {len(review)} to review, "
+                 f"{len(missing)} not found, {skipped} already in the database.", "info"]]
+    if missing:
+        shown = ", ".join(missing[:20]) + (f" and {len(missing) - 20} more" if len(missing) > 20 else "")
+        messages.append([f"Not found on TMDb: {shown}", "warning"])
+    if accepted:
+        progress(f"Fetching details for {len(accepted)} movies")
+        if review:
+            get_tmdb_movies_details(accepted)
+        else:
+            add_movies_by_id(accepted, notify=lambda message, category='message': messages.append([message, category]))
+    return {'accepted': accepted, 'review': review, 'missing': missing, 'messages': messages}
+
+@app.route('/bulk-import', methods=['POST'])
+def bulk_import():
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+
+    file = request.files.get('list')
+    if file and file.filename:
+        text = file.read().decode('utf-8-sig', errors='replace')
+        entries = parse_title_list(text, file.filename)
+    else:
+        entries = parse_title_list(request.form.get('titles', ''))
+
+    if not entries:
+        flash("No titles found in the list", "error")
+        return redirect(url_for('index'))
+    if len(entries) > BULK_IMPORT_MAX_TITLES:
+        flash(f"Lists are limited to {BULK_IMPORT_MAX_TITLES} titles; this one has {len(entries)}.", "error")
+        return redirect(url_for('index'))
+
+    return job_started(jobs.submit('bulk-import', run_bulk_import, entries))
+
+def resume_bulk_import(result):
+    accepted, review = result['accepted'], result['review']
+    if not review:
+        # Already added by the job; resume_job has flashed its messages
+        return redirect(url_for('index'))
+
+    # Matched movies ride along with the reviewed ones, so everything lands in one commit
+    session['pending_titles'] = review
+    session['selected_movies'] = accepted
+    if session.get('import_id'):
+        prefetched_searches.discard(session['import_id'])
+    session['import_id'] = prefetched_searches.start(review)
+    session.modified = True
+    return redirect(url_for('process_next_title'))
+
+# --- Background jobs ---
+
+JOB_RESUMERS = {
+    'upload-image': resume_upload_image,
+    'search-by-image': resume_search_by_image,
+    'bulk-import': resume_bulk_import,
+}
+# Prefix of the error flashed when a job of that kind fails
+JOB_FAILURE_MESSAGES = {
+    'upload-image': "Reading the image failed",
+    'search-by-image': "Reading the image failed",
+    'bulk-import': "Bulk import failed",
+}
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    job = jobs.get(job_id)
+    if job is None:
+        flash("That job no longer exists.", "error")
+        return redirect(url_for('index'))
+    return render_template('job_status.html', job=job)
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    if not session.get('logged_in'):
+        return jsonify({'error': 'not logged in'}), 401
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify({
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job['error'],
+        'result': job['result'],
+        'resume_url': url_for('resume_job', job_id=job_id),
+    })
+
+@app.route('/jobs/<job_id>/resume')
+def resume_job(job_id):
+    """Continue the wizard (or show the search) from a finished job"""
+    if not session.get('logged_in'):
+        return redirect(url_for('login'))
+    job = jobs.get(job_id)
+    if job is None:
+        flash("That job no longer exists.", "error")
+        return redirect(url_for('index'))
+    if job['status'] == 'failed':
+        flash(f"{JOB_FAILURE_MESSAGES.get(job['kind'], 'The job failed')}: {job['error']}", "error")
+        return redirect(url_for('index'))
+    if job['status'] != 'done':
+        return redirect(url_for('job_page', job_id=job_id))
+
+    for message, category in job['result']['messages']:
+        flash(message, category)
+    return JOB_RESUMERS[job['kind']](job['result'])
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
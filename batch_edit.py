@@ -0,0 +1,31 @@
+from journal import change
+
+# action -> past tense for the flash message
+BATCH_ACTIONS = {
+    'delete': 'deleted',
+    'set-notes': 'updated',
+    'replace-notes': 'updated',
+}
+
+
+def batch_changes(action, movies, notes='', find='', replace=''):
+    """Change records (see journal.change) for one batch action over the given movies.
+
+    'delete' removes them, 'set-notes' sets their Notes to ``notes`` and
+    'replace-notes' replaces every occurrence of ``find`` in their Notes
+    (case-sensitive). Movies an action leaves unchanged get no record.
+    """
+    if action not in BATCH_ACTIONS:
+        raise ValueError(f"unknown batch action: {action}")
+    changes = []
+    for movie in movies:
+        if action == 'delete':
+            changes.append(change('delete', movie))
+            continue
+        old_notes = movie.get('Notes') or ''
+        new_notes = notes if action == 'set-notes' else old_notes.replace(find, replace)
+        if new_notes != old_notes:
+            updated = dict(movie)
+            updated['Notes'] = new_notes
+            changes.append(change('update', updated))
+    return changes
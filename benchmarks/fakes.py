@@ -0,0 +1,166 @@
+"""Local stand-ins for TMDB, Google Drive and Gemini with configurable latency.
+
+TMDB is a real HTTP server (so the app's requests session, pool and rate
+limiting are exercised); Drive and Gemini replace the client calls in-process.
+"""
+import json
+import time
+import random
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from synthetic import random_title, FIRST_NAMES, LAST_NAMES
+
+
+class FakeTMDB:
+    """Serves /search/movie and /movie/<id> (with append_to_response=credits)"""
+
+    def __init__(self, latency=0.05, total_pages=3, results_per_page=20):
+        self.latency = latency
+        self.total_pages = total_pages
+        self.results_per_page = results_per_page
+        self.requests = 0
+        self._server = None
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                fake.requests += 1
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path == '/search/movie':
+                    body = fake.search(params.get('query', ''), int(params.get('page', 1)))
+                elif url.path.startswith('/movie/'):
+                    body = fake.details(url.path.split('/')[2], 'credits' in params.get('append_to_response', ''))
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return 'http://127.0.0.1:%d' % self._server.server_port
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+    def search(self, query, page):
+        rng = random.Random('%s:%d' % (query, page))
+        results = []
+        for i in range(self.results_per_page):
+            title = query.title() if page == 1 and i == 0 else random_title(rng)
+            results.append({
+                'id': 1000000 + page * 1000 + i + rng.randint(0, 10 ** 6) * 10000,
+                'title': title,
+                'release_date': '%d-01-01' % rng.randint(1920, 2025),
+            })
+        return {'page': page, 'total_pages': self.total_pages, 'results': results}
+
+    def details(self, movie_id, credits):
+        rng = random.Random(movie_id)
+        body = {'id': int(movie_id), 'title': random_title(rng),
+                'release_date': '%d-02-03' % rng.randint(1920, 2025), 'runtime': rng.randint(70, 200)}
+        if credits:
+            body['credits'] = {'cast': [{'name': rng.choice(FIRST_NAMES) + ' ' + rng.choice(LAST_NAMES)}
+                                        for _ in range(8)]}
+        return body
+
+
+class FakeDrive:
+    """In-memory Drive: files by ID, revisions are md5 checksums, each call sleeps ``latency``"""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.files = {}
+        self.calls = {'revision': 0, 'download': 0, 'upload': 0}
+        self.bytes_down = 0
+        self.bytes_up = 0
+        self._lock = threading.Lock()
+
+    def put(self, file_id, data):
+        with self._lock:
+            self.files[file_id] = data
+
+    def install(self, gdrive_helper):
+        """Point gdrive_helper's file-level calls (used by every wrapper) at this fake"""
+        gdrive_helper.get_file_revision = self.get_file_revision
+        gdrive_helper.download_file_from_gdrive = self.download_file
+        gdrive_helper.upload_file_to_gdrive = self.upload_file
+
+    def get_file_revision(self, file_id):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['revision'] += 1
+            data = self.files.get(file_id)
+        return hashlib.md5(data).hexdigest() if data is not None else None
+
+    def download_file(self, filename, file_id):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls['download'] += 1
+            data = self.files.get(file_id, b'')
+            self.bytes_down += len(data)
+        # Like gdrive_helper: readers never see a partly written file
+        with open(filename + '.download', 'wb') as f:
+            f.write(data)
+        os.replace(filename + '.download', filename)
+
+    def upload_file(self, filename, file_id, mimetype):
+        time.sleep(self.latency)
+        with open(filename, 'rb') as f:
+            data = f.read()
+        with self._lock:
+            self.calls['upload'] += 1
+            self.bytes_up += len(data)
+            self.files[file_id] = data
+        return hashlib.md5(data).hexdigest()
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGemini:
+    """Stands in for genai.Client: ``client.models.generate_content`` returns a few titles.
+
+    ``failure_rate`` of the calls raise, to exercise the fallback model.
+    """
+
+    def __init__(self, latency=1.0, titles=5, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.titles = titles
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model, contents, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self._rng.random() < self.failure_rate:
+                self.failures += 1
+                raise RuntimeError('fake %s overloaded' % model)
+            titles = [random_title(self._rng) for _ in range(self.titles)]
+        return _Response('\n'.join(titles))
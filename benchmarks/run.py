@@ -0,0 +1,399 @@
+"""Benchmark the catalog functions and routes on synthetic catalogs, against local fakes.
+
+    python benchmarks/run.py                                  # 1k, 10k and 100k rows
+    python benchmarks/run.py --rows 1000000 --repeat 5
+    python benchmarks/run.py --json before.json               # save results
+    python benchmarks/run.py --baseline before.json           # compare, exit 1 on regressions
+
+TMDB, Drive and Gemini never leave the machine; their latency is set with
+--tmdb-latency, --drive-latency and --gemini-latency. Everything runs in a
+temporary directory, so the working copy's Movies.tsv and caches are untouched.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0, REPO)
+sys.path.insert(0, HERE)
+
+from synthetic import catalog_tsv, WORDS, FIRST_NAMES, LAST_NAMES
+from fakes import FakeTMDB, FakeDrive, FakeGemini
+
+DRIVE_TSV_ID = 'bench-tsv'
+DRIVE_JOURNAL_ID = 'bench-journal'
+DRIVE_SNAPSHOT_ID = 'bench-snapshot'
+SORT_COLUMNS = ('title', 'year', 'runtime', 'actors', 'notes')
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class Recorder:
+    """Collects durations per benchmark name and summarizes them"""
+
+    def __init__(self):
+        self.results = {}
+
+    def measure(self, name, fn, repeat=10, concurrency=1):
+        """Call fn() ``repeat`` times from ``concurrency`` threads; fn receives the worker number"""
+        durations = []
+        lock = threading.Lock()
+
+        def worker(number, calls):
+            for _ in range(calls):
+                start = time.perf_counter()
+                fn(number)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    durations.append(elapsed)
+
+        started = time.perf_counter()
+        if concurrency <= 1:
+            worker(0, repeat)
+        else:
+            per_worker = [repeat // concurrency + (1 if i < repeat % concurrency else 0) for i in range(concurrency)]
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for future in [pool.submit(worker, i, calls) for i, calls in enumerate(per_worker) if calls]:
+                    future.result()
+        wall = time.perf_counter() - started
+        self.record(name, durations, wall)
+
+    def record(self, name, durations, wall=None):
+        ordered = sorted(durations)
+        wall = wall if wall is not None else sum(ordered)
+        summary = {
+            'count': len(ordered),
+            'throughput': len(ordered) / wall if wall else 0.0,
+            'p50_ms': percentile(ordered, 50) * 1000,
+            'p90_ms': percentile(ordered, 90) * 1000,
+            'p99_ms': percentile(ordered, 99) * 1000,
+            'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+        }
+        self.results[name] = summary
+        print('  %-44s %6d  %9.1f/s  p50 %9.2f  p90 %9.2f  p99 %9.2f  max %9.2f ms' % (
+            name, summary['count'], summary['throughput'], summary['p50_ms'],
+            summary['p90_ms'], summary['p99_ms'], summary['max_ms']), flush=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help='comma-separated catalog sizes (default: 1000,10000,100000)')
+    parser.add_argument('--repeat', type=int, default=20, help='calls per function/route benchmark')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent clients for route benchmarks')
+    parser.add_argument('--wizard-runs', type=int, default=3, help='image imports to run per catalog size')
+    parser.add_argument('--storage', default='tsv', choices=('tsv', 'journal', 'sqlite'), help='CATALOG_STORAGE')
+    parser.add_argument('--drive-snapshot', action='store_true',
+                        help='keep a binary snapshot on the fake Drive (DRIVE_SNAPSHOT_FILE_ID)')
+    parser.add_argument('--tmdb-latency', type=float, default=0.05, help='seconds per fake TMDB request')
+    parser.add_argument('--tmdb-pages', type=int, default=3, help='result pages per fake TMDB search')
+    parser.add_argument('--drive-latency', type=float, default=0.2, help='seconds per fake Drive call')
+    parser.add_argument('--gemini-latency', type=float, default=1.0, help='seconds per fake Gemini call')
+    parser.add_argument('--gemini-failure-rate', type=float, default=0.0,
+                        help='fraction of Gemini calls that fail (exercises the fallback model)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='results file from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='p50 slowdown (fraction) reported as a regression (default: 0.2)')
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_environment(args, workdir, tmdb_url):
+    """Environment for app.py; must be in place before it is imported"""
+    os.environ.update({
+        'tmdb_key': 'bench',
+        'GEMINI_API_KEY': 'bench',
+        'TMDB_BASE_URL': tmdb_url,
+        'DRIVE_TSV_FILE_ID': DRIVE_TSV_ID,
+        'CATALOG_STORAGE': args.storage,
+        # Keep the TMDB cache in memory, so runs don't warm each other up
+        'TMDB_CACHE_DB': '',
+    })
+    if args.storage == 'journal':
+        os.environ['DRIVE_JOURNAL_FILE_ID'] = DRIVE_JOURNAL_ID
+    if args.drive_snapshot:
+        os.environ['DRIVE_SNAPSHOT_FILE_ID'] = DRIVE_SNAPSHOT_ID
+    os.chdir(workdir)
+
+
+def logged_in_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    return client
+
+
+def expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError('%s returned %d' % (response.request.path, response.status_code))
+    return response
+
+
+def random_query(rng):
+    """One /search form, using one of the fields the way people do"""
+    field = rng.choice(('title', 'title', 'actors', 'year', 'runtime', 'notes'))
+    form = {'title': '', 'year': '', 'runtime': '', 'actors': '', 'notes': '', 'sort': ''}
+    if field == 'title':
+        form['title'] = rng.choice(WORDS)
+    elif field == 'actors':
+        form['actors'] = rng.choice(FIRST_NAMES + LAST_NAMES)
+    elif field == 'year':
+        form['year'] = str(rng.randint(1920, 2025))
+    elif field == 'runtime':
+        form['runtime'] = str(rng.randint(80, 180))
+    else:
+        form['notes'] = 'watch'
+    return form
+
+
+def tiny_image(rng):
+    """A small PNG with random pixels, so every upload misses the image-title cache"""
+    from PIL import Image
+    image = Image.new('RGB', (32, 32))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(32 * 32)])
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def bench_functions(appmod, recorder, args, rng):
+    movies = appmod.catalog.movies()
+
+    recorder.measure('load_tsv', lambda _: appmod.load_tsv(), repeat=max(1, args.repeat // 4))
+    if args.storage != 'sqlite':
+        recorder.measure('save_tsv', lambda _: appmod.save_tsv(movies), repeat=max(1, args.repeat // 4))
+        appmod.uploader.flush(60)
+
+    def search(_):
+        query = random_query(rng)
+        appmod.search_movies(query['title'], query['year'], query['runtime'], query['actors'], query['notes'])
+
+    recorder.measure('search_movies', search, repeat=args.repeat)
+
+    for column in SORT_COLUMNS:
+        recorder.measure('catalog.sorted(%s)' % column, lambda _: appmod.catalog.sorted(column, True),
+                         repeat=args.repeat)
+        recorder.measure('sort_movies(%s)' % column, lambda _: appmod.sort_movies(movies, column),
+                         repeat=max(1, args.repeat // 4))
+
+    page = movies[:appmod.INDEX_PAGE_SIZE]
+    with appmod.app.test_request_context('/'):
+        recorder.measure('render index.html', lambda _: appmod.render_template(
+            'index.html', movies=page, searched=False, sort_by='title', direction='asc', count=len(movies),
+            rows_view='index', next_offset=appmod.next_offset(0, page, len(movies))), repeat=args.repeat)
+
+
+def bench_routes(appmod, recorder, args):
+    clients = [logged_in_client(appmod.app) for _ in range(args.concurrency)]
+    rng = random.Random(args.seed)
+
+    def get(path):
+        return lambda worker: expect(clients[worker].get(path), 200)
+
+    recorder.measure('GET /', get('/'), args.repeat, args.concurrency)
+    for column in SORT_COLUMNS:
+        recorder.measure('GET /?sort=%s&dir=desc' % column, get('/?sort=%s&dir=desc' % column),
+                         args.repeat, args.concurrency)
+    recorder.measure('GET /rows (second page)', get('/rows?view=index&sort=year&offset=%d' % appmod.INDEX_PAGE_SIZE),
+                     args.repeat, args.concurrency)
+
+    recorder.measure('POST /search', lambda worker: expect(
+        clients[worker].post('/search', data=random_query(rng)), 200), args.repeat, args.concurrency)
+    recorder.measure('GET /search?sort=runtime', get('/search?sort=runtime'), args.repeat, args.concurrency)
+    for client in clients:
+        client.get('/clear')
+
+    recorder.measure('POST /add-by-title (TMDB)', lambda worker: expect(
+        clients[worker].post('/add-by-title', data={'title': ' '.join(rng.sample(WORDS, 2))}), 200, 302),
+        args.repeat, args.concurrency)
+
+    movie_ids = list(appmod.catalog.by_id())
+    recorder.measure('POST /batch (notes on 50)', lambda worker: expect(
+        clients[worker].post('/batch', data={'action': 'set-notes', 'ids': rng.sample(movie_ids, min(50, len(movie_ids))),
+                                             'notes': rng.choice(WORDS)}), 302),
+        args.repeat, args.concurrency)
+
+
+def run_wizard(appmod, client, rng, recorder_durations):
+    """One image import: upload, wait for Gemini, pick the first match for every title, confirm"""
+    started = time.perf_counter()
+    response = expect(client.post('/upload-image', data={'image': (io.BytesIO(tiny_image(rng)), 'shelf.png')},
+                                  headers={'Accept': 'application/json'}), 202)
+    status_url = response.get_json()['status_url']
+    while True:
+        job = expect(client.get(status_url), 200).get_json()
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.02)
+    recorder_durations['wizard: extract titles (job)'].append(time.perf_counter() - started)
+
+    step = time.perf_counter()
+    response = expect(client.get(job['resume_url']), 302)
+    recorder_durations['wizard: resume'].append(time.perf_counter() - step)
+    while '/process-next-title' in response.headers.get('Location', ''):
+        step = time.perf_counter()
+        page = expect(client.get('/process-next-title'), 200, 302)
+        if page.status_code == 302:
+            response = page
+            break
+        match = re.search(r'name="selected_movie_id" value="(\d+)"', page.get_data(as_text=True))
+        data = {'selected_movie_id': match.group(1)} if match else {'action': 'reject'}
+        response = expect(client.post('/process-next-title', data=data), 302)
+        recorder_durations['wizard: choose one title'].append(time.perf_counter() - step)
+
+    step = time.perf_counter()
+    expect(client.get('/confirm-add-all'), 200, 302)
+    expect(client.post('/confirm-add-all'), 302)
+    recorder_durations['wizard: confirm all'].append(time.perf_counter() - step)
+    recorder_durations['wizard: total'].append(time.perf_counter() - started)
+
+
+def bench_wizard(appmod, recorder, args, rng):
+    client = logged_in_client(appmod.app)
+    durations = {name: [] for name in ('wizard: extract titles (job)', 'wizard: resume',
+                                       'wizard: choose one title', 'wizard: confirm all', 'wizard: total')}
+    for _ in range(args.wizard_runs):
+        run_wizard(appmod, client, rng, durations)
+    for name, values in durations.items():
+        recorder.record(name, values)
+
+
+def compare(results, baseline, threshold):
+    """Print p50 changes against a baseline run; return the list of regressions"""
+    regressions = []
+    print('\nCompared with %s (%s):' % (baseline.get('commit'), baseline.get('created')))
+    for size, benches in results.items():
+        for name, summary in benches.items():
+            old = baseline.get('results', {}).get(size, {}).get(name)
+            if not old or not old['p50_ms'] or not summary['count']:
+                continue
+            change = summary['p50_ms'] / old['p50_ms'] - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((size, name, change))
+            print('  %8s rows  %-44s p50 %9.2f -> %9.2f ms  %+6.1f%%%s' % (
+                size, name, old['p50_ms'], summary['p50_ms'], change * 100, flag))
+    return regressions
+
+
+def snapshot_bytes(tsv_data):
+    """The binary snapshot app.py would upload for this TSV"""
+    import csv
+    import hashlib
+    import snapshot
+    movies = list(csv.DictReader(io.StringIO(tsv_data.decode('utf-8'), newline=''), delimiter='\t'))
+    path = os.path.join(tempfile.mkdtemp(prefix='movie-bench-snapshot-'), 'Movies.snapshot')
+    snapshot.write_snapshot(movies, hashlib.md5(tsv_data).hexdigest(), path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.rows.split(',') if size.strip()]
+    output = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    tmdb = FakeTMDB(latency=args.tmdb_latency, total_pages=args.tmdb_pages)
+    drive = FakeDrive(latency=args.drive_latency)
+    gemini = FakeGemini(latency=args.gemini_latency, failure_rate=args.gemini_failure_rate, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix='movie-bench-')
+    setup_environment(args, workdir, tmdb.start())
+
+    import gdrive_helper
+    drive.install(gdrive_helper)
+    drive.put(DRIVE_TSV_ID, catalog_tsv(0))
+    drive.put(DRIVE_JOURNAL_ID, b'')
+    import app as appmod
+    appmod.gemini_client = gemini
+
+    # Shared across sizes: a repeated image would be answered from the title cache
+    wizard_rng = random.Random(args.seed)
+    results = {}
+    for rows in sizes:
+        print('\n%d rows (%s storage)' % (rows, args.storage), flush=True)
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+
+        appmod.uploader.flush(60)
+        data = catalog_tsv(rows, args.seed)
+        drive.put(DRIVE_TSV_ID, data)
+        drive.put(DRIVE_JOURNAL_ID, b'')
+        if args.drive_snapshot:
+            drive.put(DRIVE_SNAPSHOT_ID, snapshot_bytes(data))
+        for local in ('Movies.tsv', 'Movies.snapshot'):
+            if os.path.exists(local):
+                os.remove(local)
+        appmod.catalog.invalidate()
+        start = time.perf_counter()
+        appmod.catalog.movies()
+        recorder.record('catalog reload (Drive + parse)', [time.perf_counter() - start])
+
+        bench_functions(appmod, recorder, args, rng)
+        bench_routes(appmod, recorder, args)
+        bench_wizard(appmod, recorder, args, wizard_rng)
+        appmod.uploader.flush(60)
+        results[str(rows)] = recorder.results
+
+    counters = {
+        'tmdb_requests': tmdb.requests,
+        'drive_calls': drive.calls,
+        'drive_bytes_down': drive.bytes_down,
+        'drive_bytes_up': drive.bytes_up,
+        'gemini_calls': gemini.calls,
+        'gemini_failures': gemini.failures,
+    }
+    print('\nFakes:', json.dumps(counters))
+
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('json', 'baseline')},
+        'counters': counters,
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Wrote', output)
+
+    tmdb.stop()
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('\n%d benchmark(s) slower than the baseline by more than %d%%'
+                  % (len(regressions), args.threshold * 100))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
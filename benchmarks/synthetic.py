@@ -0,0 +1,54 @@
+import csv
+import io
+import random
+
+FIELDNAMES = ['ID', 'Title', 'Year', 'Runtime', 'Actors', 'Notes']
+
+WORDS = ('night', 'day', 'return', 'city', 'dark', 'love', 'war', 'star', 'last', 'lost', 'king',
+         'road', 'house', 'river', 'ghost', 'summer', 'secret', 'blue', 'iron', 'silent', 'wild',
+         'golden', 'empire', 'shadow', 'heart', 'storm', 'island', 'game', 'story', 'dream')
+FIRST_NAMES = ('Anna', 'Ben', 'Carla', 'David', 'Elena', 'Frank', 'Grace', 'Hugo', 'Iris', 'Jack',
+               'Kate', 'Liam', 'Maya', 'Noah', 'Olga', 'Paul', 'Quinn', 'Rosa', 'Sam', 'Tara')
+LAST_NAMES = ('Adams', 'Brooks', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito',
+              'Jones', 'Kim', 'Lopez', 'Moreau', 'Novak', 'Owens', 'Patel', 'Rossi', 'Silva')
+NOTES = ('', '', '', 'seen', 'favourite', 'watch again', 'borrowed', 'blu-ray', 'dvd', '4k')
+
+
+def random_title(rng):
+    words = rng.sample(WORDS, rng.randint(1, 4))
+    title = ' '.join(words).title()
+    if rng.random() < 0.15:
+        title = 'The ' + title
+    if rng.random() < 0.05:
+        title += ' ' + str(rng.randint(2, 4))
+    return title
+
+
+def generate_movies(rows, seed=0):
+    """Yield ``rows`` deterministic movie dicts shaped like Movies.tsv rows"""
+    rng = random.Random(seed)
+    for i in range(rows):
+        actors = ', '.join(rng.choice(FIRST_NAMES) + ' ' + rng.choice(LAST_NAMES)
+                           for _ in range(rng.randint(1, 5)))
+        yield {
+            'ID': str(100000 + i),
+            'Title': random_title(rng),
+            'Year': str(rng.randint(1920, 2025)) if rng.random() > 0.01 else '',
+            'Runtime': str(rng.randint(70, 200)) if rng.random() > 0.02 else '',
+            'Actors': actors,
+            'Notes': rng.choice(NOTES),
+        }
+
+
+def catalog_tsv(rows, seed=0):
+    """The bytes of a synthetic Movies.tsv with ``rows`` movies"""
+    buffer = io.StringIO(newline='')
+    writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES, delimiter='\t')
+    writer.writeheader()
+    writer.writerows(generate_movies(rows, seed))
+    return buffer.getvalue().encode('utf-8')
+
+
+def write_catalog(path, rows, seed=0):
+    with open(path, 'wb') as f:
+        f.write(catalog_tsv(rows, seed))
@@ -4,7 +4,7 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-from query_data import find_titles
+from query_data import title_index
 
 TOKEN = os.getenv("TOKEN")
 
@@ -16,6 +16,8 @@ bot = commands.Bot(command_prefix="!", intents=intents)
 
 @bot.event
 async def on_ready():
+    # Build the title index before the first DM arrives
+    await bot.loop.run_in_executor(None, title_index.refresh)
     print(f"Logged in as {bot.user}")
 
 
@@ -32,9 +34,15 @@ async def on_message(message):
     content = message.content.strip()
     if content.startswith("!"):
         search_phrase = content.strip('! ')
-        found_titles = find_titles(search_phrase)
+        # Reading Movies.tsv (or Drive) blocks, so keep it off the event loop
+        await bot.loop.run_in_executor(None, title_index.refresh)
+        found_titles = title_index.find(search_phrase)
         if not found_titles:
-            await message.channel.send(f"No movie found for phrase {search_phrase}.")
+            closest = title_index.closest(search_phrase)
+            if closest:
+                await message.channel.send(f"No movie found for phrase {search_phrase}. Did you mean:\n" + "\n".join(closest))
+            else:
+                await message.channel.send(f"No movie found for phrase {search_phrase}.")
             return
         
         response = "\n".join(found_titles[:20])
@@ -0,0 +1,97 @@
+import csv
+import io
+import os
+import re
+
+from fuzzy import normalize_title
+
+# "Title (1999)", "Title [1999]", "Title, 1999", "Title<TAB>1999" or "Title | 1999"
+TRAILING_YEAR_RE = re.compile(r'^(?P<title>.+?)\s*(?:\((?P<a>\d{4})\)|\[(?P<b>\d{4})\]|[,\t|]\s*(?P<c>\d{4}))\s*$')
+YEAR_RE = re.compile(r'^\d{4}$')
+# Header names recognised for the title and year columns of CSV/TSV lists
+TITLE_COLUMNS = ('title', 'name', 'movie', 'film')
+YEAR_COLUMNS = ('year', 'release year', 'released')
+
+
+def _year(value):
+    value = (value or '').strip()
+    return value[:4] if YEAR_RE.match(value[:4]) else ''
+
+
+def _parse_table(text, delimiter):
+    rows = [row for row in csv.reader(io.StringIO(text), delimiter=delimiter) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    title_col = next((header.index(name) for name in TITLE_COLUMNS if name in header), None)
+    if title_col is not None:
+        year_col = next((header.index(name) for name in YEAR_COLUMNS if name in header), None)
+        rows = rows[1:]
+    else:
+        title_col, year_col = 0, 1
+    entries = []
+    for row in rows:
+        if title_col >= len(row):
+            continue
+        year = _year(row[year_col]) if year_col is not None and year_col < len(row) else ''
+        entries.append((row[title_col].strip(), year))
+    return entries
+
+
+def _parse_lines(text):
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = TRAILING_YEAR_RE.match(line)
+        if match:
+            entries.append((match.group('title').strip(), match.group('a') or match.group('b') or match.group('c')))
+        else:
+            entries.append((line, ''))
+    return entries
+
+
+def parse_title_list(text, filename=''):
+    """Turn an uploaded list into (title, year) pairs; year is '' when the list doesn't give one.
+
+    .csv and .tsv files are read as tables (a header row naming a "title" and
+    optionally a "year" column is honoured); anything else is one title per
+    line with an optional trailing year. Repeated titles are dropped.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        entries = _parse_table(text, ',')
+    elif extension in ('.tsv', '.tab'):
+        entries = _parse_table(text, '\t')
+    else:
+        entries = _parse_lines(text)
+
+    unique = []
+    seen = set()
+    for title, year in entries:
+        key = (normalize_title(title), year)
+        if key[0] and key not in seen:
+            seen.add(key)
+            unique.append((title, year))
+    return unique
+
+
+def classify_matches(title, year, matches):
+    """Decide what to do with a title given its TMDB search results.
+
+    Returns ('accept', match) when exactly one result has the same normalized
+    title (and the same year, when the list gives one), ('review', None) when
+    there are results but none stands out, and ('missing', None) otherwise.
+    """
+    if not matches:
+        return 'missing', None
+    key = normalize_title(title)
+    exact = [m for m in matches if normalize_title(m.get('title')) == key]
+    if year:
+        exact = [m for m in exact if m.get('release_date') == year]
+    if len(exact) == 1:
+        return 'accept', exact[0]
+    if len(matches) == 1 and (not year or matches[0].get('release_date') == year):
+        return 'accept', matches[0]
+    return 'review', None
@@ -0,0 +1,210 @@
+import os
+import json
+import hashlib
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+
+from records import SORT_KEYS, as_movie
+
+# How long (seconds) a cached catalog is trusted before the Drive revision is checked again
+CATALOG_MAX_AGE = float(os.getenv("CATALOG_MAX_AGE", "30"))
+
+
+class CatalogCache:
+    """Keep the parsed movie list in memory and only re-download it when Drive changes.
+
+    ``load`` parses the local TSV, ``download`` refreshes the local TSV from Drive
+    and ``fetch_revision`` returns a cheap marker (md5/modified time) for the Drive copy.
+    While ``hold()`` returns True (local changes not yet uploaded) Drive is not consulted.
+
+    With several worker processes, ``write_lock`` is the lock their writers share (taken
+    before this cache's own lock, around Drive refreshes) and ``local_stamp()`` returns
+    something that changes whenever the local files change, so writes made by another
+    worker are picked up on the next read.
+    """
+
+    def __init__(self, load, download, fetch_revision, max_age=CATALOG_MAX_AGE, hold=None,
+                 write_lock=None, local_stamp=None):
+        self._load = load
+        self._download = download
+        self._fetch_revision = fetch_revision
+        self._hold = hold
+        self._write_lock = write_lock if write_lock is not None else nullcontext()
+        self._local_stamp = local_stamp
+        self._stamp = None
+        self.max_age = max_age
+
+        self._lock = threading.RLock()
+        self._movies = None
+        self._reload = False
+        self._revision = None
+        self._checked_at = 0.0
+        # Bumped whenever the cached list changes, so derived indexes know when to rebuild
+        self.version = 0
+        self._fingerprint = None
+        self._fingerprint_version = None
+        # Sort permutations (row positions) per (column, reverse), valid for _orders_version
+        self._orders = {}
+        self._orders_version = None
+        # ID -> Movie, valid for _ids_version
+        self._ids = {}
+        self._ids_version = None
+
+    def movies(self):
+        """Return a fresh list of the cached Movie records, refreshing from Drive if stale"""
+        self.ensure_fresh()
+        with self._lock:
+            return list(self._current())
+
+    def ensure_fresh(self):
+        """Check Drive (at most every max_age seconds) and reload if the remote copy changed"""
+        if not self._due():
+            return
+        # Lock order: the shared write lock, then ours
+        with self._write_lock:
+            with self._lock:
+                if self._due():
+                    self._refresh()
+
+    def _due(self):
+        if self._movies is None:
+            return True
+        if time.monotonic() - self._checked_at < self.max_age:
+            return False
+        return not (self._hold is not None and self._hold())
+
+    def _current(self):
+        """The cached list, reloaded first if the local files changed (call with the lock held)"""
+        if not self._reload and self._local_stamp is not None and self._local_stamp() != self._stamp:
+            self._reload = True
+        if self._reload:
+            self._load_local()
+        return self._movies
+
+    def _load_local(self):
+        # Stamp first: a write landing during the load triggers another reload
+        stamp = self._local_stamp() if self._local_stamp is not None else None
+        self._movies = self._records(self._load())
+        self._stamp = stamp
+        self._reload = False
+        self.version += 1
+
+    def replace(self, movies, revision=None):
+        """Install a catalog we just wrote ourselves, so it isn't downloaded again"""
+        with self._lock:
+            self._movies = self._records(movies)
+            self._stamp = self._local_stamp() if self._local_stamp is not None else None
+            self._reload = False
+            self.version += 1
+            if revision is not None:
+                self._revision = revision
+            self._checked_at = time.monotonic()
+
+    def mark_changed(self):
+        """The local store changed underneath us; reload it (without Drive) on next read"""
+        with self._lock:
+            self._reload = True
+
+    def set_revision(self, revision):
+        """Record the Drive revision produced by one of our own uploads"""
+        with self._lock:
+            if revision is not None:
+                self._revision = revision
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next read to check Drive"""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def sorted(self, sort_by, reverse=False):
+        """Return the movies ordered by one column of SORT_KEYS.
+
+        Each ordering is computed once per catalog version and kept as a compact
+        array of row positions; an unknown column gives the catalog order.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            movies = self._current()
+            key = SORT_KEYS.get(sort_by)
+            if key is None:
+                return list(movies)
+            if self._orders_version != self.version:
+                self._orders = {}
+                self._orders_version = self.version
+            order = self._orders.get((sort_by, reverse))
+            if order is None:
+                order = array('L', sorted(range(len(movies)), key=lambda i: key(movies[i]), reverse=reverse))
+                self._orders[(sort_by, reverse)] = order
+            return [movies[i] for i in order]
+
+    def by_id(self):
+        """Map of ID to Movie (the first row wins for duplicate IDs), built once per catalog version.
+
+        The dict is shared; callers must not modify it.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            movies = self._current()
+            if self._ids_version != self.version:
+                ids = {}
+                for movie in movies:
+                    ids.setdefault(movie.ID, movie)
+                self._ids = ids
+                self._ids_version = self.version
+            return self._ids
+
+    def movies_with_version(self):
+        """Return (movies, version) read under one lock"""
+        self.ensure_fresh()
+        with self._lock:
+            return list(self._current()), self.version
+
+    def fingerprint(self):
+        """Content hash of the catalog, identical in every worker holding the same data.
+
+        Recomputed only when the cached list changes.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            movies = self._current()
+            if self._fingerprint_version != self.version:
+                data = json.dumps(movies, sort_keys=True, default=dict).encode('utf-8')
+                self._fingerprint = hashlib.sha1(data).hexdigest()
+                self._fingerprint_version = self.version
+            return self._fingerprint
+
+    @property
+    def revision(self):
+        return self._revision
+
+    def _refresh(self):
+        if self._movies is not None and self._hold is not None and self._hold():
+            # The local file is newer than Drive; downloading would discard our edits
+            return
+
+        try:
+            revision = self._fetch_revision()
+        except Exception as e:
+            print("Error checking catalog revision:", e)
+            revision = None
+
+        if self._movies is not None and (revision is None or revision == self._revision):
+            # Unchanged (or Drive unreachable): keep serving what we have
+            self._checked_at = time.monotonic()
+            return
+
+        try:
+            self._download()
+        except Exception as e:
+            print("Error downloading catalog:", e)
+            revision = None
+        self._load_local()
+        self._revision = revision
+        self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _records(movies):
+        return [as_movie(m) for m in movies]
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+
+# Quiet period (seconds) after the last save before uploading
+UPLOAD_DELAY = float(os.getenv("UPLOAD_DELAY", "2"))
+# Upper bound on how long a continuous stream of saves can postpone an upload
+UPLOAD_MAX_DELAY = float(os.getenv("UPLOAD_MAX_DELAY", "30"))
+# Retry backoff after a failed upload: doubles from the first value up to the cap
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", "2"))
+UPLOAD_MAX_BACKOFF = float(os.getenv("UPLOAD_MAX_BACKOFF", "300"))
+
+
+class WriteBehindUploader:
+    """Upload a local file to Drive from a background thread.
+
+    ``schedule()`` only marks the file dirty; a burst of saves within ``delay``
+    seconds of each other is coalesced into a single call to ``upload``. Failed
+    uploads are retried with exponential backoff. ``on_synced`` is called with
+    whatever ``upload`` returns (the new Drive revision).
+    """
+
+    def __init__(self, upload, on_synced=None, delay=UPLOAD_DELAY, max_delay=UPLOAD_MAX_DELAY,
+                 retry_backoff=UPLOAD_RETRY_BACKOFF, max_backoff=UPLOAD_MAX_BACKOFF):
+        self._upload = upload
+        self._on_synced = on_synced
+        self.delay = delay
+        self.max_delay = max_delay
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._dirty = False
+        self._uploading = False
+        self._flush_requested = False
+        self._first_dirty_at = None
+        self._last_dirty_at = None
+
+        self.saves = 0
+        self.uploads = 0
+        self.failures = 0
+        self.last_synced_at = None
+        self.last_error = None
+
+    @property
+    def pending(self):
+        """True while there are saves that have not reached Drive yet"""
+        with self._cond:
+            return self._dirty or self._uploading
+
+    def schedule(self):
+        """Note that the local file changed and should be uploaded soon"""
+        with self._cond:
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_dirty_at = now
+            self._dirty = True
+            self._last_dirty_at = now
+            self.saves += 1
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Upload any pending change now and wait for it; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if not (self._dirty or self._uploading):
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._dirty or self._uploading:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def status(self):
+        with self._cond:
+            return {
+                'pending': self._dirty or self._uploading,
+                'saves': self.saves,
+                'uploads': self.uploads,
+                'failures': self.failures,
+                'last_synced_at': self.last_synced_at,
+                'last_error': self.last_error,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='drive-uploader', daemon=True)
+            self._thread.start()
+
+    def _wait_until_due(self):
+        """Block (holding the condition) until a pending upload should start"""
+        while True:
+            if not self._dirty:
+                self._cond.wait()
+                continue
+            if self._flush_requested:
+                return
+            now = time.monotonic()
+            due = min(self._last_dirty_at + self.delay, self._first_dirty_at + self.max_delay)
+            if now >= due:
+                return
+            self._cond.wait(due - now)
+
+    def _run(self):
+        backoff = self.retry_backoff
+        while True:
+            with self._cond:
+                self._wait_until_due()
+                self._dirty = False
+                self._uploading = True
+
+            try:
+                revision = self._upload()
+            except Exception as e:
+                print("Error uploading to Google Drive:", e)
+                with self._cond:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    self._uploading = False
+                    if not self._dirty:
+                        self._dirty = True
+                        self._first_dirty_at = self._last_dirty_at = time.monotonic()
+                    self._cond.notify_all()
+                    self._cond.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = self.retry_backoff
+            if self._on_synced is not None:
+                self._on_synced(revision)
+            with self._cond:
+                self.uploads += 1
+                self.last_synced_at = time.time()
+                self.last_error = None
+                self._uploading = False
+                if not self._dirty:
+                    self._flush_requested = False
+                self._cond.notify_all()
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+import zlib
+
+from records import FIELDS
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'tsv': ('text/tab-separated-values', 'tsv'),
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+# Rows serialized per chunk handed to the WSGI server
+EXPORT_CHUNK_ROWS = 500
+
+
+def export_chunks(movies, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the movies as UTF-8 chunks of TSV, CSV (with a header row) or JSON Lines"""
+    buffer = io.StringIO(newline='')
+    if fmt == 'jsonl':
+        def write(movie):
+            buffer.write(json.dumps({key: movie.get(key, '') for key in FIELDS}, ensure_ascii=False) + '\n')
+    else:
+        writer = csv.writer(buffer, delimiter='\t' if fmt == 'tsv' else ',', lineterminator='\n')
+        writer.writerow(FIELDS)
+
+        def write(movie):
+            writer.writerow([movie.get(key, '') for key in FIELDS])
+
+    for count, movie in enumerate(movies, 1):
+        write(movie)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,73 @@
+import re
+import heapq
+import threading
+from collections import defaultdict
+
+# Below this similarity a candidate is not worth showing at all
+FUZZY_MIN_SCORE = 0.3
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_title(title):
+    """Lowercase, straighten curly quotes, drop punctuation and collapse whitespace"""
+    title = re.sub("(’|‘)", "'", title or '').lower()
+    title = _PUNCTUATION_RE.sub('', title)
+    return ' '.join(title.split())
+
+
+def trigrams(title):
+    """Trigrams of each word, padded like pg_trgm ("  w", " wo", "wor", "ord", "rd ")"""
+    grams = set()
+    for word in normalize_title(title).split():
+        padded = '  ' + word + ' '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """Fuzzy title lookup: trigram -> items, scored by Dice similarity of trigram sets.
+
+    Only items sharing at least one trigram with the query are scored, and the
+    best k are picked with a heap. ``key`` extracts the title from an item;
+    ``version`` records which catalog version the index was built from.
+    """
+
+    def __init__(self, items=(), key=None):
+        self._key = key or (lambda item: item)
+        self._lock = threading.RLock()
+        self.version = None
+        self.rebuild(items, None)
+
+    def rebuild(self, items, version):
+        postings = defaultdict(list)
+        entries = []
+        for doc, item in enumerate(items):
+            grams = trigrams(self._key(item))
+            entries.append((item, len(grams)))
+            for gram in grams:
+                postings[gram].append(doc)
+        with self._lock:
+            self._postings = postings
+            self._entries = entries
+            self.version = version
+
+    def top(self, query, k=5, min_score=FUZZY_MIN_SCORE):
+        """Return up to k (score, item) pairs, best first, scoring at least min_score"""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        with self._lock:
+            postings, entries = self._postings, self._entries
+
+        shared = defaultdict(int)
+        for gram in grams:
+            for doc in postings.get(gram, ()):
+                shared[doc] += 1
+
+        size = len(grams)
+        # -doc breaks ties in catalog order
+        scored = ((2.0 * count / (size + entries[doc][1]), -doc) for doc, count in shared.items())
+        best = heapq.nlargest(k, scored)
+        return [(score, entries[-doc][0]) for score, doc in best if score >= min_score]
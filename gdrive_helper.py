@@ -3,32 +3,107 @@ from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
 from google.oauth2 import service_account
 import io
 import os
+import threading
+
+from metrics import drive_bytes
 
 # Configuration
 CREDENTIALS_FILE = 'credentials.json'
 SCOPES = ['https://www.googleapis.com/auth/drive']
 TSV_FILENAME = 'Movies.tsv'
 DRIVE_FILE_ID = os.getenv("DRIVE_TSV_FILE_ID")  # ID of file in Google Drive
+JOURNAL_FILENAME = 'Movies.journal'
+DRIVE_JOURNAL_FILE_ID = os.getenv("DRIVE_JOURNAL_FILE_ID")  # ID of the change journal in Google Drive
+SNAPSHOT_FILENAME = 'Movies.snapshot'
+DRIVE_SNAPSHOT_FILE_ID = os.getenv("DRIVE_SNAPSHOT_FILE_ID")  # ID of the binary snapshot in Google Drive (optional)
+
+# Metadata fields used to tell whether the Drive copy has changed
+REVISION_FIELDS = 'md5Checksum,modifiedTime'
+
+_credentials = None
+_credentials_lock = threading.Lock()
+# The client's httplib2 transport isn't thread-safe, so each thread (request workers,
+# the background uploader) builds its own service once and keeps it
+_local = threading.local()
 
 def get_drive_service():
-    creds = service_account.Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    return build('drive', 'v3', credentials=creds)
+    global _credentials
+    service = getattr(_local, 'service', None)
+    if service is None:
+        with _credentials_lock:
+            if _credentials is None:
+                _credentials = service_account.Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
+        service = _local.service = build('drive', 'v3', credentials=_credentials, cache_discovery=False)
+    return service
 
-def download_tsv_from_gdrive():
-    """Download TSV file from Google Drive"""
+def _revision_from_metadata(metadata):
+    return metadata.get('md5Checksum') or metadata.get('modifiedTime')
+
+def get_file_revision(file_id):
+    """Return a marker for the current Drive revision of a file without downloading it"""
     service = get_drive_service()
-    request = service.files().get_media(fileId=DRIVE_FILE_ID)
-    fh = io.FileIO(TSV_FILENAME, 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-
-def upload_tsv_to_gdrive():
-    """Upload TSV file to Google Drive (overwrite)"""
+    metadata = service.files().get(fileId=file_id, fields=REVISION_FIELDS).execute()
+    return _revision_from_metadata(metadata)
+
+def download_file_from_gdrive(filename, file_id):
+    """Download a file from Google Drive, swapping it in only once complete"""
     service = get_drive_service()
-    media = MediaIoBaseUpload(io.FileIO(TSV_FILENAME, 'rb'), mimetype='text/tab-separated-values')
-    service.files().update(
-        fileId=DRIVE_FILE_ID,
-        media_body=media
+    request = service.files().get_media(fileId=file_id)
+    # Other workers read the file without a lock; never let them see a partial download
+    tmp_filename = '%s.%d.%d.download' % (filename, os.getpid(), threading.get_ident())
+    fh = io.FileIO(tmp_filename, 'wb')
+    try:
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+    except BaseException:
+        fh.close()
+        os.remove(tmp_filename)
+        raise
+    fh.close()
+    drive_bytes.inc(os.path.getsize(tmp_filename), direction='download')
+    os.replace(tmp_filename, filename)
+
+def upload_file_to_gdrive(filename, file_id, mimetype):
+    """Upload a file to Google Drive (overwrite) and return the new revision marker"""
+    service = get_drive_service()
+    media = MediaIoBaseUpload(io.FileIO(filename, 'rb'), mimetype=mimetype)
+    metadata = service.files().update(
+        fileId=file_id,
+        media_body=media,
+        fields=REVISION_FIELDS
     ).execute()
+    drive_bytes.inc(os.path.getsize(filename), direction='upload')
+    return _revision_from_metadata(metadata)
+
+def get_tsv_revision():
+    """Return a marker for the current Drive revision of the TSV without downloading it"""
+    return get_file_revision(DRIVE_FILE_ID)
+
+def download_tsv_from_gdrive():
+    """Download TSV file from Google Drive"""
+    download_file_from_gdrive(TSV_FILENAME, DRIVE_FILE_ID)
+
+def upload_tsv_to_gdrive(filename=TSV_FILENAME):
+    """Upload TSV file to Google Drive (overwrite) and return the new revision marker"""
+    return upload_file_to_gdrive(filename, DRIVE_FILE_ID, 'text/tab-separated-values')
+
+def get_journal_revision():
+    return get_file_revision(DRIVE_JOURNAL_FILE_ID)
+
+def download_journal_from_gdrive():
+    """Download the change journal from Google Drive"""
+    download_file_from_gdrive(JOURNAL_FILENAME, DRIVE_JOURNAL_FILE_ID)
+
+def upload_journal_to_gdrive(filename=JOURNAL_FILENAME):
+    """Upload the change journal to Google Drive (overwrite) and return the new revision marker"""
+    return upload_file_to_gdrive(filename, DRIVE_JOURNAL_FILE_ID, 'application/x-ndjson')
+
+def download_snapshot_from_gdrive():
+    """Download the binary catalog snapshot from Google Drive"""
+    download_file_from_gdrive(SNAPSHOT_FILENAME, DRIVE_SNAPSHOT_FILE_ID)
+
+def upload_snapshot_to_gdrive(filename=SNAPSHOT_FILENAME):
+    """Upload the binary catalog snapshot to Google Drive (overwrite) and return the new revision marker"""
+    return upload_file_to_gdrive(filename, DRIVE_SNAPSHOT_FILE_ID, 'application/octet-stream')
@@ -0,0 +1,66 @@
+import io
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest side (pixels) of the image sent to Gemini; larger photos are downscaled
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+# Images already within the dimension bound are still re-encoded when larger than this
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(1536 * 1024)))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Gemini accepts these as-is
+SUPPORTED_MIME_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/heic', 'image/heif'}
+
+
+def sniff_mime_type(data):
+    """Detect the image type from its magic bytes, or None if unrecognised"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp':
+        brand = data[8:12]
+        if brand in (b'heic', b'heix', b'hevc', b'hevx'):
+            return 'image/heic'
+        if brand in (b'mif1', b'msf1', b'heif'):
+            return 'image/heif'
+    if data.startswith(b'BM'):
+        return 'image/bmp'
+    return None
+
+def prepare_image(data):
+    """Return (bytes, mime_type) ready for Gemini.
+
+    Oversized or unsupported images are rotated upright, downscaled to
+    IMAGE_MAX_DIMENSION and re-encoded as JPEG; small supported images pass
+    through untouched. If Pillow can't decode the file it is sent as-is.
+    """
+    mime_type = sniff_mime_type(data)
+    if mime_type in SUPPORTED_MIME_TYPES and len(data) <= IMAGE_MAX_BYTES:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if max(image.size) <= IMAGE_MAX_DIMENSION:
+                    return data, mime_type
+        except (UnidentifiedImageError, OSError):
+            return data, mime_type
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            out = io.BytesIO()
+            image.save(out, format='JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True)
+    except (UnidentifiedImageError, OSError) as e:
+        print("Could not preprocess image:", e)
+        return data, mime_type or 'image/jpeg'
+
+    encoded = out.getvalue()
+    if mime_type in SUPPORTED_MIME_TYPES and len(encoded) >= len(data):
+        return data, mime_type
+    return encoded, 'image/jpeg'
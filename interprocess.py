@@ -0,0 +1,76 @@
+"""Coordination between worker processes sharing one working directory (gunicorn -w N)."""
+import os
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; there the lock only covers this process
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock held across processes (flock on ``path``) and threads.
+
+    Re-entrant within a thread, so a locked section may call helpers that
+    lock again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a+')
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class SharedState:
+    """A small JSON document every worker reads and writes; callers hold the FileLock"""
+
+    def __init__(self, path, defaults=None):
+        self.path = path
+        self.defaults = dict(defaults or {})
+
+    def read(self):
+        state = dict(self.defaults)
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return state
+
+    def get(self, key):
+        return self.read().get(key)
+
+    def update(self, **fields):
+        state = self.read()
+        state.update(fields)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
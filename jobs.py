@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Job table shared by every worker process, so any of them can answer a status poll
+JOBS_DB = os.getenv("JOBS_DB", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs are deleted after this many seconds
+JOB_TTL = float(os.getenv("JOB_TTL", str(24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT,
+    status TEXT,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    pid INTEGER,
+    created REAL,
+    updated REAL
+)
+"""
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobRunner:
+    """Run slow work (Gemini calls) on a small thread pool, tracking it in SQLite.
+
+    ``submit(kind, fn, *args)`` calls ``fn(progress, *args)`` in the background,
+    where ``progress(text)`` records a status line; whatever fn returns must be
+    JSON-serialisable and is stored as the job result.
+    """
+
+    def __init__(self, db_path=JOBS_DB, max_workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jobs')
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.execute(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        conn = self._conn()
+        with conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', list(fields.values()) + [job_id])
+
+    def submit(self, kind, fn, *args):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM jobs WHERE updated < ?', (now - self.ttl,))
+            conn.execute(
+                'INSERT INTO jobs (id, kind, status, progress, pid, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', 'Waiting to start', os.getpid(), now, now)
+            )
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        self._update(job_id, status='running', progress='Started')
+        try:
+            result = fn(lambda text: self._update(job_id, progress=text), *args)
+        except Exception as e:
+            print(f"Job {job_id} failed:", e)
+            self._update(job_id, status='failed', error=str(e))
+            return
+        self._update(job_id, status='done', progress='Finished', result=json.dumps(result))
+
+    def get(self, job_id):
+        """Return the job as a dict (result decoded), or None if unknown"""
+        row = self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['status'] in ('queued', 'running') and not _process_alive(job['pid']):
+            # The worker that owned it exited (restart, crash) before finishing
+            self._update(job_id, status='failed', error='The worker running this job stopped.')
+            job['status'], job['error'] = 'failed', 'The worker running this job stopped.'
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
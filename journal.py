@@ -0,0 +1,101 @@
+import os
+import json
+
+# Append-only log of catalog changes, replayed on top of the Movies.tsv snapshot
+JOURNAL_FILE = 'Movies.journal'
+
+# Fold the journal into a new snapshot once it grows past this many bytes
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(256 * 1024)))
+
+
+def change(op, movie):
+    """Build a journal record. op is 'add', 'update' or 'delete'"""
+    record = {'op': op, 'ID': str(movie['ID'])}
+    if op != 'delete':
+        record['movie'] = movie
+    return record
+
+def append_changes(changes, path=JOURNAL_FILE):
+    lines = ''.join(json.dumps(c, ensure_ascii=False, default=dict) + '\n' for c in changes)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_changes(path=JOURNAL_FILE):
+    if not os.path.exists(path):
+        return []
+    changes = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                # A torn final line from an interrupted append; everything before it is valid
+                print("Skipping unreadable journal line:", line[:80])
+    return changes
+
+def apply_changes(movies, changes):
+    """Replay journal records over a snapshot, returning the resulting movie list.
+
+    New movies go to the front of the list, matching how the routes insert them.
+    A delete removes every row with its ID; an update replaces the first one.
+    """
+    by_key = {}
+    duplicates = {}   # ID -> keys of its later rows
+    for position, movie in enumerate(movies):
+        key = str(movie.get('ID', ''))
+        if key in by_key:
+            # Later rows with a repeated ID keep their place under a key of their own
+            duplicates.setdefault(key, []).append((key, position))
+            key = (key, position)
+        by_key[key] = movie
+
+    added = []
+    for record in changes:
+        op = record.get('op')
+        key = str(record.get('ID'))
+        if op == 'delete':
+            by_key.pop(key, None)
+            for duplicate in duplicates.pop(key, ()):
+                by_key.pop(duplicate, None)
+        elif op == 'add':
+            if key not in by_key:
+                added.append(key)
+            by_key[key] = record['movie']
+        elif op == 'update' and key in by_key:
+            by_key[key] = record['movie']
+
+    added_keys = set(added)
+    head = []
+    seen = set()
+    for key in reversed(added):
+        if key in by_key and key not in seen:
+            seen.add(key)
+            head.append(by_key[key])
+    return head + [movie for key, movie in by_key.items() if key not in added_keys]
+
+def journal_size(path=JOURNAL_FILE):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def discard_changes(size, path=JOURNAL_FILE):
+    """Drop the first ``size`` bytes of the file, keeping whatever was appended after them"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(size)
+            rest = f.read()
+    except FileNotFoundError:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(rest)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def clear_journal(path=JOURNAL_FILE):
+    with open(path, 'w', encoding='utf-8'):
+        pass
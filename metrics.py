@@ -0,0 +1,186 @@
+"""Request phase timing (Server-Timing) and process-wide Prometheus metrics.
+
+Counters and histograms live in this process only; with several gunicorn
+workers each one reports its own, and Prometheus sums them per instance.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, before_render_template, template_rendered
+
+# Histogram buckets (seconds), from a cache hit to a slow Gemini call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+             for name, value in zip(names, values))
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % self.name]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append('%s%s %s' % (self.name, _labels(self.labelnames, key), _number(value)))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append('%s_bucket%s %d' % (self.name, _labels(names, key + (_number(float(bound)),)), cumulative))
+                lines.append('%s_bucket%s %d' % (self.name, _labels(names, key + ('+Inf',)), series[-1]))
+                lines.append('%s_sum%s %s' % (self.name, _labels(self.labelnames, key), _number(series[-2])))
+                lines.append('%s_count%s %d' % (self.name, _labels(self.labelnames, key), series[-1]))
+        return lines
+
+
+class CallbackMetric:
+    """A counter or gauge whose samples are read from elsewhere at scrape time.
+
+    ``read`` returns a list of (label values, value).
+    """
+
+    def __init__(self, name, help, type, labelnames, read):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self._read = read
+
+    def collect(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.type)]
+        for key, value in self._read():
+            lines.append('%s%s %s' % (self.name, _labels(self.labelnames, key), _number(value)))
+        return lines
+
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+def counter(name, help, labelnames=()):
+    return register(Counter(name, help, labelnames))
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return register(Histogram(name, help, labelnames, buckets))
+
+def callback(name, help, type, labelnames, read):
+    return register(CallbackMetric(name, help, type, labelnames, read))
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+phase_seconds = histogram('movie_phase_seconds', 'Time spent per phase (drive, parse, tmdb, gemini, render, ...)',
+                          ('phase',))
+request_seconds = histogram('movie_request_seconds', 'Request handling time per endpoint', ('endpoint', 'method'))
+drive_bytes = counter('movie_drive_bytes_total', 'Bytes transferred to and from Google Drive', ('direction',))
+gemini_calls = counter('movie_gemini_calls_total', 'Gemini requests by model and outcome', ('model', 'outcome'))
+gemini_fallbacks = counter('movie_gemini_fallbacks_total', 'Image extractions that fell back to the second model')
+
+
+def record_phase(phase, seconds):
+    """Add a phase duration to the histogram and, inside a request, to its Server-Timing"""
+    phase_seconds.observe(seconds, phase=phase)
+    if has_app_context():
+        timings = g.setdefault('server_timing', {})
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+@contextmanager
+def timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+def start_request():
+    """before_request hook"""
+    g.request_started = time.perf_counter()
+
+def finish_request(request, response):
+    """after_request hook: observe the request and add a Server-Timing header"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    request_seconds.observe(total, endpoint=request.endpoint or 'unknown', method=request.method)
+    timings = g.get('server_timing', {})
+    entries = ['%s;dur=%.1f' % (phase, seconds * 1000) for phase, seconds in timings.items()]
+    entries.append('total;dur=%.1f' % (total * 1000))
+    response.headers['Server-Timing'] = ', '.join(entries)
+    return response
+
+
+def instrument_templates(app):
+    """Time Jinja rendering as the 'render' phase"""
+    def started(sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    def rendered(sender, template, context, **extra):
+        started_at = g.pop('render_started', None)
+        if started_at is not None:
+            record_phase('render', time.perf_counter() - started_at)
+
+    before_render_template.connect(started, app, weak=False)
+    template_rendered.connect(rendered, app, weak=False)
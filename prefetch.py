@@ -0,0 +1,58 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PrefetchStore:
+    """Run ``fetch(key)`` in the background for every key of an import and keep the futures.
+
+    Each image import gets its own id; the wizard asks for results by
+    (import id, key) and only waits if that particular fetch hasn't finished.
+    Imports older than ``ttl`` seconds are dropped.
+    """
+
+    def __init__(self, fetch, max_workers=4, ttl=3600):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._imports = {}   # import id -> (created, {key: future})
+
+    def start(self, keys):
+        """Submit every key and return the new import id"""
+        import_id = uuid.uuid4().hex
+        futures = {}
+        for key in keys:
+            if key not in futures:
+                futures[key] = self._executor.submit(self._fetch, key)
+        with self._lock:
+            self._expire()
+            self._imports[import_id] = (time.monotonic(), futures)
+        return import_id
+
+    def get(self, import_id, key):
+        """Return the prefetched result, or None if there is none (unknown import, key or failure)"""
+        with self._lock:
+            entry = self._imports.get(import_id)
+        future = entry[1].get(key) if entry else None
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print("Prefetch failed for", key, ":", e)
+            return None
+
+    def discard(self, import_id):
+        with self._lock:
+            entry = self._imports.pop(import_id, None)
+        if entry:
+            for future in entry[1].values():
+                future.cancel()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for import_id in [i for i, (created, _) in self._imports.items() if created < cutoff]:
+            for future in self._imports.pop(import_id)[1].values():
+                future.cancel()
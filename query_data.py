@@ -1,36 +1,111 @@
+import os
 import re
 import csv
+import time
+import threading
 
-def load_titles():
-    file_path = "Movies.tsv"
+from fuzzy import TrigramIndex
+
+TSV_FILE = "Movies.tsv"
+# Set BOT_DRIVE_SYNC=1 to have the bot pull Movies.tsv from Drive when the Drive copy changes
+BOT_DRIVE_SYNC = os.getenv("BOT_DRIVE_SYNC", "") not in ("", "0", "false")
+# How long (seconds) between Drive revision checks
+BOT_DRIVE_MAX_AGE = float(os.getenv("BOT_DRIVE_MAX_AGE", "60"))
+
+def load_titles(file_path=TSV_FILE):
     titles = []
     with open(file_path, newline="", encoding="utf-8") as f:
         reader = csv.reader(f, delimiter="\t")
+        next(reader, None)  # header
         for row in reader:
             if len(row) > 1:
                 titles.append(row[1])
     return titles
-        
-def find_titles(search_phrase):
-    titles = load_titles()
+
+def normalize_phrase(search_phrase):
     search_phrase = re.sub(r"(’|‘)", "'", search_phrase)
     search_phrase = re.sub(r'(”|“)', '"', search_phrase)
+    return search_phrase
+
+
+class TitleIndex:
+    """Titles from Movies.tsv with their lowercased forms, reloaded only when the file changes.
+
+    refresh() does the blocking work (stat, optional Drive check, parse) and is
+    meant to run in an executor; find() only reads memory and is safe on the
+    event loop.
+    """
+
+    def __init__(self, path=TSV_FILE, fetch_revision=None, download=None, max_age=BOT_DRIVE_MAX_AGE):
+        self.path = path
+        self._fetch_revision = fetch_revision
+        self._download = download
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._revision = None
+        self._checked_at = 0.0
+        # Replaced as a whole on reload, so readers never see a half-built index
+        self._entries = ()
+        self._fuzzy = TrigramIndex()
 
-    if search_phrase.count('"') == 2:
-        found_titles = []
-        search_phrase = search_phrase.strip('"')
-        for title in titles:
-            found_title = re.search(re.escape(search_phrase), title, re.IGNORECASE)
-            if found_title:
-                found_titles.append(title)
-    
-    else:
-        found_titles = []
-        terms = search_phrase.split()
-        for title in titles:
-            title_lower = title.lower()
-            if all(term.lower() in title_lower for term in terms):
-                found_titles.append(title)
+    def refresh(self):
+        with self._lock:
+            if self._fetch_revision is not None and time.monotonic() - self._checked_at >= self.max_age:
+                self._sync_drive()
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamp:
+                return
+            titles = load_titles(self.path)
+            self._entries = tuple((title, title.lower()) for title in titles)
+            self._fuzzy.rebuild(titles, stamp)
+            self._stamp = stamp
 
+    def find(self, search_phrase):
+        search_phrase = normalize_phrase(search_phrase)
+        entries = self._entries
+
+        if search_phrase.count('"') == 2:
+            phrase = search_phrase.strip('"').lower()
+            return [title for title, title_lower in entries if phrase in title_lower]
+
+        # Most selective (longest) term first, so most titles are rejected after one test
+        terms = sorted((term.lower() for term in search_phrase.split()), key=len, reverse=True)
+        return [title for title, title_lower in entries
+                if all(term in title_lower for term in terms)]
+
+    def closest(self, search_phrase, k=5):
+        """Titles most similar to the phrase, for when find() has no exact hits"""
+        phrase = normalize_phrase(search_phrase).strip('"')
+        return [title for score, title in self._fuzzy.top(phrase, k)]
+
+    def _sync_drive(self):
+        self._checked_at = time.monotonic()
+        try:
+            revision = self._fetch_revision()
+            if revision is not None and revision != self._revision:
+                self._download()
+                self._revision = revision
+        except Exception as e:
+            # Keep answering from the local copy
+            print("Error syncing titles from Drive:", e)
+
+
+def _drive_index():
+    if not BOT_DRIVE_SYNC:
+        return TitleIndex()
+    from gdrive_helper import get_tsv_revision, download_tsv_from_gdrive
+    return TitleIndex(fetch_revision=get_tsv_revision, download=download_tsv_from_gdrive)
+
+title_index = _drive_index()
+
+def find_titles(search_phrase):
+    title_index.refresh()
+    found_titles = title_index.find(search_phrase)
     print(found_titles)
     return found_titles
@@ -0,0 +1,101 @@
+from operator import attrgetter
+
+FIELDS = ('ID', 'Title', 'Year', 'Runtime', 'Actors', 'Notes')
+# A set-like view, so csv.DictWriter can check a record's fields against its own
+_KEYS = dict.fromkeys(FIELDS).keys()
+
+
+def _number(value):
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Movie:
+    """One catalog row, with its numbers parsed and its text lowercased once.
+
+    Reads like the dict it replaces (``movie['Title']``, ``movie.get(...)``,
+    ``dict(movie)``) so templates, csv and the journal keep working. Records are
+    not edited in place: copy with dict(movie), change the copy, and commit it.
+    """
+
+    __slots__ = FIELDS + ('year_num', 'runtime_num', 'title_key', 'actors_key', 'notes_key')
+
+    def __init__(self, ID='', Title='', Year='', Runtime='', Actors='', Notes=''):
+        self.ID = '' if ID is None else str(ID)
+        self.Title = Title or ''
+        self.Year = '' if Year is None else str(Year)
+        self.Runtime = '' if Runtime is None else str(Runtime)
+        self.Actors = Actors or ''
+        self.Notes = Notes or ''
+
+        self.year_num = _number(self.Year)
+        self.runtime_num = _number(self.Runtime)
+        self.title_key = self.Title.lower()
+        self.actors_key = self.Actors.lower()
+        self.notes_key = self.Notes.lower()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data.get(key) for key in FIELDS})
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in FIELDS}
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def keys(self):
+        return _KEYS
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in FIELDS]
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, Movie):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Movie(%r)' % self.to_dict()
+
+
+def as_movie(movie):
+    """Return ``movie`` as a Movie record (dicts from TSV, TMDB or SQLite are converted)"""
+    return movie if isinstance(movie, Movie) else Movie.from_dict(movie)
+
+
+# One definition of every sortable column, shared by the list page, /rows and /search
+SORT_KEYS = {
+    'title': attrgetter('title_key'),
+    'year': attrgetter('year_num'),
+    'runtime': attrgetter('runtime_num'),
+    'actors': attrgetter('actors_key'),
+    'notes': attrgetter('notes_key'),
+}
+
+
+def sort_movies(movies, sort_by, reverse=False):
+    """Sort by one column of SORT_KEYS; an unknown column keeps the given order"""
+    movies = [as_movie(m) for m in movies]
+    key = SORT_KEYS.get(sort_by)
+    if key is not None:
+        movies.sort(key=key, reverse=reverse)
+    return movies
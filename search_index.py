@@ -0,0 +1,239 @@
+import re
+import bisect
+import threading
+
+from records import as_movie
+
+# Text fields searched by /search, as (form field, movie key)
+TEXT_FIELDS = (('title', 'Title'), ('year', 'Year'), ('actors', 'Actors'), ('notes', 'Notes'))
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+def movie_matches(movie, title='', year='', runtime='', actors='', notes=''):
+    """The /search rules: lowercased substrings, runtime within 10 minutes (blank runtimes pass)"""
+    movie = as_movie(movie)
+    if title and title not in movie.title_key:
+        return False
+    if year and year not in movie.Year.lower():
+        return False
+    if actors and actors not in movie.actors_key:
+        return False
+    if notes and notes not in movie.notes_key:
+        return False
+    if runtime:
+        try:
+            if movie['Runtime']:
+                w = float(movie['Runtime'])
+                target = float(runtime)
+                if not (target - 10 <= w <= target + 10):
+                    return False
+        except ValueError:
+            return False
+    return True
+
+
+class _FieldIndex:
+    """Token -> set of doc ids for one field, with sorted vocabularies for prefix/suffix lookups"""
+
+    def __init__(self):
+        self.postings = {}
+        self._sorted = None
+        self._sorted_reversed = None
+
+    def add(self, doc, tokens):
+        for token in tokens:
+            docs = self.postings.get(token)
+            if docs is None:
+                self.postings[token] = docs = set()
+                self._sorted = self._sorted_reversed = None
+            docs.add(doc)
+
+    def remove(self, doc, tokens):
+        for token in tokens:
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.discard(doc)
+            if not docs:
+                del self.postings[token]
+                self._sorted = self._sorted_reversed = None
+
+    def _prefixed(self, vocab, prefix):
+        start = bisect.bisect_left(vocab, prefix)
+        for i in range(start, len(vocab)):
+            if not vocab[i].startswith(prefix):
+                break
+            yield vocab[i]
+
+    def with_prefix(self, prefix):
+        if self._sorted is None:
+            self._sorted = sorted(self.postings)
+        return list(self._prefixed(self._sorted, prefix))
+
+    def with_suffix(self, suffix):
+        if self._sorted_reversed is None:
+            self._sorted_reversed = sorted(token[::-1] for token in self.postings)
+        return [token[::-1] for token in self._prefixed(self._sorted_reversed, suffix[::-1])]
+
+    def containing(self, fragment):
+        return [token for token in self.postings if fragment in token]
+
+    def candidates(self, query):
+        """Superset of the docs whose text contains query as a substring, or None if unknown"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        if len(tokens) == 1:
+            # A lone fragment may sit anywhere inside a token
+            groups = [self.containing(tokens[0])]
+        else:
+            # "...xx yy zz..." : first token ends a word, middle ones are whole, last one starts a word
+            groups = [self.with_suffix(tokens[0])]
+            groups += [[token] if token in self.postings else [] for token in tokens[1:-1]]
+            groups.append(self.with_prefix(tokens[-1]))
+
+        result = None
+        # Intersect the smallest groups first
+        for group in sorted(groups, key=len):
+            docs = set()
+            for token in group:
+                docs |= self.postings[token]
+            result = docs if result is None else result & docs
+            if not result:
+                return set()
+        return result
+
+
+class SearchIndex:
+    """In-memory inverted index over the catalog for /search.
+
+    Posting lists narrow each field to a candidate set; the candidates are then
+    checked with movie_matches so results are identical to a full scan.
+    ``version`` records which catalog version the index was built from.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None
+        self._clear()
+
+    def _clear(self):
+        self._fields = {key: _FieldIndex() for _, key in TEXT_FIELDS}
+        self._docs = {}        # doc id -> movie
+        self._tokens = {}      # doc id -> {field: tokens}
+        self._positions = {}   # doc id -> catalog order
+        self._by_id = {}       # movie ID -> doc id
+        self._duplicate_ids = set()   # IDs held by more than one doc
+        self._runtimes = []    # sorted (runtime, doc id)
+        self._blank_runtimes = set()
+        self._next_doc = 0
+        self._first_position = 0
+
+    def rebuild(self, movies, version):
+        with self._lock:
+            self._clear()
+            for position, movie in enumerate(movies):
+                self._add(movie, position)
+            self.version = version
+
+    def apply_changes(self, changes, old_version, new_version):
+        """Update incrementally if the index matches old_version; otherwise leave it for a rebuild"""
+        with self._lock:
+            if self.version != old_version:
+                return
+            if any(str(record['ID']) in self._duplicate_ids for record in changes):
+                # A delete drops every row with the ID; simpler to rebuild than to track them all
+                return
+            for record in changes:
+                movie_id = str(record['ID'])
+                doc = self._by_id.get(movie_id)
+                if record['op'] == 'delete':
+                    if doc is not None:
+                        self._remove(doc)
+                elif doc is not None:
+                    position = self._positions[doc]
+                    self._remove(doc)
+                    self._add(record['movie'], position)
+                elif record['op'] == 'add':
+                    # New movies go to the front, as in journal.apply_changes
+                    self._add(record['movie'], self._first_position - 1)
+            self.version = new_version
+
+    def _add(self, movie, position):
+        doc = self._next_doc
+        self._next_doc += 1
+        self._docs[doc] = movie
+        self._positions[doc] = position
+        self._first_position = min(self._first_position, position)
+        movie_id = str(movie.get('ID', ''))
+        if movie_id in self._by_id:
+            self._duplicate_ids.add(movie_id)
+        self._by_id.setdefault(movie_id, doc)
+
+        tokens = {}
+        for _, key in TEXT_FIELDS:
+            tokens[key] = set(tokenize(str(movie.get(key) or '')))
+            self._fields[key].add(doc, tokens[key])
+        self._tokens[doc] = tokens
+
+        runtime = movie.get('Runtime')
+        if not runtime:
+            self._blank_runtimes.add(doc)
+        else:
+            try:
+                bisect.insort(self._runtimes, (float(runtime), doc))
+            except ValueError:
+                pass
+
+    def _remove(self, doc):
+        movie = self._docs.pop(doc)
+        del self._positions[doc]
+        movie_id = str(movie.get('ID', ''))
+        if self._by_id.get(movie_id) == doc:
+            del self._by_id[movie_id]
+        for key, tokens in self._tokens.pop(doc).items():
+            self._fields[key].remove(doc, tokens)
+        self._blank_runtimes.discard(doc)
+        runtime = movie.get('Runtime')
+        if runtime:
+            try:
+                entry = (float(runtime), doc)
+            except ValueError:
+                return
+            i = bisect.bisect_left(self._runtimes, entry)
+            if i < len(self._runtimes) and self._runtimes[i] == entry:
+                del self._runtimes[i]
+
+    def search(self, title='', year='', runtime='', actors='', notes=''):
+        query = {'title': title, 'year': year, 'actors': actors, 'notes': notes}
+        with self._lock:
+            candidates = None
+            for field, key in TEXT_FIELDS:
+                if not query[field]:
+                    continue
+                docs = self._fields[key].candidates(query[field])
+                if docs is None:
+                    continue
+                candidates = docs if candidates is None else candidates & docs
+                if not candidates:
+                    return []
+
+            if runtime:
+                try:
+                    target = float(runtime)
+                except ValueError:
+                    return []
+                lo = bisect.bisect_left(self._runtimes, (target - 10, -1))
+                hi = bisect.bisect_right(self._runtimes, (target + 10, self._next_doc))
+                docs = {doc for _, doc in self._runtimes[lo:hi]} | self._blank_runtimes
+                candidates = docs if candidates is None else candidates & docs
+
+            if candidates is None:
+                candidates = self._docs.keys()
+            ordered = sorted(candidates, key=self._positions.__getitem__)
+            return [self._docs[doc] for doc in ordered
+                    if movie_matches(self._docs[doc], title, year, runtime, actors, notes)]
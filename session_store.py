@@ -0,0 +1,59 @@
+import os
+import time
+import struct
+import threading
+
+# Seconds between sweeps of the session directory
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "3600"))
+
+# cachelib's bookkeeping file and the suffix of its half-written temp files
+CACHELIB_COUNT_FILE = '__wz_cache_count'
+CACHELIB_TEMP_SUFFIX = '.__wz_cache'
+
+
+def sweep_expired_sessions(directory):
+    """Delete expired sessions from a cachelib FileSystemCache directory.
+
+    cachelib only prunes expired files once the store passes its threshold,
+    so without this an idle directory keeps every old session around.
+    Each session file starts with its expiry as a 4-byte timestamp (0 = never).
+    Returns how many files were removed.
+    """
+    now = time.time()
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if name == CACHELIB_COUNT_FILE or name.endswith(CACHELIB_TEMP_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, 'rb') as f:
+                expires = struct.unpack('I', f.read(4))[0]
+            if expires != 0 and expires < now:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+        except (OSError, struct.error) as e:
+            print("Skipping unreadable session file:", name, e)
+    return removed
+
+def start_session_sweeper(directory, interval=SESSION_SWEEP_INTERVAL):
+    """Sweep the directory every `interval` seconds on a daemon thread, off the request path"""
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                sweep_expired_sessions(directory)
+            except Exception as e:
+                print("Error sweeping sessions:", e)
+
+    thread = threading.Thread(target=run, name='session-sweeper', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,96 @@
+"""Compact binary copy of Movies.tsv: MessagePack rows, zlib-compressed.
+
+Layout: b'MVS1', the hex md5 of the TSV bytes it was made from (32 bytes),
+then zlib(msgpack([[ID, Title, Year, Runtime, Actors, Notes], ...])).
+The md5 matches Drive's md5Checksum for the same TSV, so a downloaded
+snapshot can be checked against the TSV revision without decompressing it.
+"""
+import os
+import zlib
+import hashlib
+import threading
+
+try:
+    import msgspec
+except ImportError:  # optional; without it only Movies.tsv is used
+    msgspec = None
+
+from records import FIELDS, Movie
+
+SNAPSHOT_FILE = 'Movies.snapshot'
+SNAPSHOT_MAGIC = b'MVS1'
+SNAPSHOT_COMPRESS_LEVEL = int(os.getenv("SNAPSHOT_COMPRESS_LEVEL", "6"))
+
+_HEADER_SIZE = len(SNAPSHOT_MAGIC) + 32
+
+if msgspec is not None:
+    _encoder = msgspec.msgpack.Encoder()
+    _decoder = msgspec.msgpack.Decoder(list[tuple[str, str, str, str, str, str]])
+
+
+def available():
+    return msgspec is not None
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(movies, source_md5, path=SNAPSHOT_FILE, source_mtime_ns=None):
+    """Write the movies (dicts or Movie records) atomically, tagged with the TSV's md5.
+
+    Pass the TSV's mtime when it may have been replaced since it was read (another
+    worker saving); the snapshot then carries that mtime and is not taken as current
+    for the newer TSV.
+    """
+    rows = [tuple('' if movie.get(key) is None else str(movie.get(key)) for key in FIELDS) for movie in movies]
+    data = zlib.compress(_encoder.encode(rows), SNAPSHOT_COMPRESS_LEVEL)
+    # Per-writer temp name: several workers may write the snapshot at once
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + source_md5.encode('ascii') + data)
+    if source_mtime_ns is not None:
+        os.utime(tmp_path, ns=(source_mtime_ns, source_mtime_ns))
+    os.replace(tmp_path, path)
+
+
+def snapshot_source(path=SNAPSHOT_FILE):
+    """The md5 of the TSV the snapshot was made from, or None if there is no valid snapshot"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+    except OSError:
+        return None
+    if len(header) != _HEADER_SIZE or not header.startswith(SNAPSHOT_MAGIC):
+        return None
+    return header[len(SNAPSHOT_MAGIC):].decode('ascii', errors='replace')
+
+
+def read_snapshot(path=SNAPSHOT_FILE):
+    """Decode the snapshot into Movie records, or None if it is missing or unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(SNAPSHOT_MAGIC):
+            return None
+        rows = _decoder.decode(zlib.decompress(data[_HEADER_SIZE:]))
+    except (OSError, zlib.error, msgspec.DecodeError) as e:
+        print("Ignoring unreadable snapshot:", e)
+        return None
+    return [Movie(*row) for row in rows]
+
+
+def snapshot_is_current(snapshot_path=SNAPSHOT_FILE, tsv_path='Movies.tsv'):
+    """True when the snapshot exists and is at least as new as the TSV next to it"""
+    try:
+        snapshot_mtime = os.stat(snapshot_path).st_mtime_ns
+    except OSError:
+        return False
+    try:
+        return snapshot_mtime >= os.stat(tsv_path).st_mtime_ns
+    except OSError:
+        return True
@@ -0,0 +1,246 @@
+import os
+import csv
+import sqlite3
+import threading
+
+# Local SQLite copy of the catalog (CATALOG_STORAGE=sqlite); Movies.tsv remains the Drive backup
+DB_FILE = os.getenv("CATALOG_DB_FILE", "Movies.db")
+
+FIELDNAMES = ['ID', 'Title', 'Year', 'Runtime', 'Actors', 'Notes']
+
+# Lowercased copies of the text columns, used for sorting and substring checks
+SORT_COLUMNS = {
+    'title': 'title_key',
+    'year': 'year_num',
+    'runtime': 'runtime_num',
+    'actors': 'actors_key',
+    'notes': 'notes_key',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    pos INTEGER PRIMARY KEY,
+    ID TEXT, Title TEXT, Year TEXT, Runtime TEXT, Actors TEXT, Notes TEXT,
+    title_key TEXT, actors_key TEXT, notes_key TEXT,
+    year_num REAL, runtime_num REAL
+);
+CREATE INDEX IF NOT EXISTS movies_id ON movies (ID);
+CREATE INDEX IF NOT EXISTS movies_year ON movies (year_num);
+CREATE INDEX IF NOT EXISTS movies_runtime ON movies (runtime_num);
+CREATE INDEX IF NOT EXISTS movies_title ON movies (title_key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5 (
+    Title, Actors, Notes, content='movies', content_rowid='pos', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS movies_ai AFTER INSERT ON movies BEGIN
+    INSERT INTO movies_fts (rowid, Title, Actors, Notes) VALUES (new.pos, new.Title, new.Actors, new.Notes);
+END;
+CREATE TRIGGER IF NOT EXISTS movies_ad AFTER DELETE ON movies BEGIN
+    INSERT INTO movies_fts (movies_fts, rowid, Title, Actors, Notes) VALUES ('delete', old.pos, old.Title, old.Actors, old.Notes);
+END;
+CREATE TRIGGER IF NOT EXISTS movies_au AFTER UPDATE ON movies BEGIN
+    INSERT INTO movies_fts (movies_fts, rowid, Title, Actors, Notes) VALUES ('delete', old.pos, old.Title, old.Actors, old.Notes);
+    INSERT INTO movies_fts (rowid, Title, Actors, Notes) VALUES (new.pos, new.Title, new.Actors, new.Notes);
+END;
+"""
+
+# The trigram tokenizer can only match substrings of at least this many characters
+MIN_FTS_QUERY = 3
+
+
+def _number(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+def _row_values(movie):
+    values = [str(movie.get(name) or '') for name in FIELDNAMES]
+    return values + [
+        values[1].lower(), values[4].lower(), values[5].lower(),
+        _number(values[2]), _number(values[3]),
+    ]
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SqliteCatalog:
+    """Movie catalog stored in SQLite with B-tree and FTS5 indexes.
+
+    Rows keep the catalog's list order in ``pos``; new movies get a position
+    before the current first row, the same way the routes insert at index 0.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self.has_fts = True
+        conn = self._conn()
+        with conn:
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError as e:
+                # Older SQLite without FTS5/trigram: fall back to plain substring scans
+                print("SQLite full-text search unavailable:", e)
+                self.has_fts = False
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, sql, params=()):
+        return [{name: row[name] for name in FIELDNAMES} for row in self._conn().execute(sql, params)]
+
+    # --- Import / export ---
+
+    def replace_all(self, movies):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM movies')
+            conn.executemany(
+                'INSERT INTO movies (pos, ID, Title, Year, Runtime, Actors, Notes, '
+                'title_key, actors_key, notes_key, year_num, runtime_num) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                ([pos] + _row_values(movie) for pos, movie in enumerate(movies))
+            )
+
+    def import_tsv(self, tsv_file):
+        """Load the TSV into the database if it changed since the last import/export"""
+        if not os.path.exists(tsv_file):
+            return
+        stamp = self._file_stamp(tsv_file)
+        if stamp == self._get_meta('tsv_stamp'):
+            return
+        with open(tsv_file, newline='', encoding='utf-8') as f:
+            self.replace_all(csv.DictReader(f, delimiter='\t'))
+        self._set_meta('tsv_stamp', stamp)
+
+    def export_tsv(self, tsv_file):
+        tmp_file = tsv_file + '.tmp'
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES, delimiter='\t')
+            writer.writeheader()
+            for row in self._conn().execute('SELECT ID, Title, Year, Runtime, Actors, Notes FROM movies ORDER BY pos'):
+                writer.writerow(dict(row))
+        os.replace(tmp_file, tsv_file)
+        # Our own export shouldn't trigger a re-import
+        self._set_meta('tsv_stamp', self._file_stamp(tsv_file))
+
+    def _file_stamp(self, path):
+        st = os.stat(path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _get_meta(self, key):
+        row = self._conn().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key, value):
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    # --- Queries ---
+
+    def all(self):
+        return self._rows('SELECT * FROM movies ORDER BY pos')
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM movies').fetchone()[0]
+
+    def get(self, movie_id):
+        rows = self._rows('SELECT * FROM movies WHERE ID = ? ORDER BY pos LIMIT 1', (str(movie_id),))
+        return rows[0] if rows else None
+
+    def get_many(self, movie_ids, chunk=500):
+        """{ID: row} for the IDs that exist (the first row for duplicate IDs)"""
+        ids = [str(movie_id) for movie_id in movie_ids]
+        found = {}
+        for start in range(0, len(ids), chunk):
+            batch = ids[start:start + chunk]
+            placeholders = ', '.join('?' * len(batch))
+            for row in self._rows(f'SELECT * FROM movies WHERE ID IN ({placeholders}) ORDER BY pos', batch):
+                found.setdefault(row['ID'], row)
+        return found
+
+    def find_by_title(self, title):
+        rows = self._rows('SELECT * FROM movies WHERE title_key = ? ORDER BY pos LIMIT 1', (title.lower(),))
+        return rows[0] if rows else None
+
+    def sorted(self, sort_by, reverse=False, limit=-1, offset=0):
+        """Rows in list-page order; limit/offset select one window of it"""
+        column = SORT_COLUMNS.get(sort_by)
+        if column is None:
+            order = 'pos'
+        else:
+            # NULLs (blank numbers) sort as 0, like the Python key functions
+            key = f'COALESCE({column}, 0)' if column.endswith('_num') else column
+            order = f"{key} {'DESC' if reverse else 'ASC'}, pos"
+        return self._rows(f'SELECT * FROM movies ORDER BY {order} LIMIT ? OFFSET ?', (limit, offset))
+
+    def search(self, title='', year='', runtime='', actors='', notes=''):
+        """Same matching rules as the /search form: case-insensitive substrings, runtime within 10 minutes"""
+        clauses = []
+        params = []
+        fts_terms = []
+        for column, key, value in (('Title', 'title_key', title), ('Actors', 'actors_key', actors), ('Notes', 'notes_key', notes)):
+            if not value:
+                continue
+            value = value.lower()
+            if self.has_fts and len(value) >= MIN_FTS_QUERY:
+                fts_terms.append(f'{column} : {_fts_phrase(value)}')
+            clauses.append(f'instr({key}, ?) > 0')
+            params.append(value)
+        if fts_terms:
+            clauses.insert(0, 'pos IN (SELECT rowid FROM movies_fts WHERE movies_fts MATCH ?)')
+            params.insert(0, ' AND '.join(fts_terms))
+        if year:
+            clauses.append('instr(lower(Year), ?) > 0')
+            params.append(year.lower())
+        if runtime:
+            target = _number(runtime)
+            if target is None:
+                return []
+            clauses.append("(Runtime IS NULL OR Runtime = '' OR runtime_num BETWEEN ? AND ?)")
+            params += [target - 10, target + 10]
+        where = ' AND '.join(clauses) or '1'
+        return self._rows(f'SELECT * FROM movies WHERE {where} ORDER BY pos', params)
+
+    # --- Changes ---
+
+    def apply(self, changes):
+        """Apply journal-style change records (see journal.change) in one transaction"""
+        conn = self._conn()
+        with conn:
+            for record in changes:
+                op = record['op']
+                movie_id = str(record['ID'])
+                if op == 'delete':
+                    conn.execute('DELETE FROM movies WHERE ID = ?', (movie_id,))
+                    continue
+                values = _row_values(record['movie'])
+                # Like journal.apply_changes: an update replaces the first row with the ID only
+                pos = conn.execute('SELECT MIN(pos) FROM movies WHERE ID = ?', (movie_id,)).fetchone()[0]
+                if pos is not None:
+                    conn.execute(
+                        'UPDATE movies SET ID = ?, Title = ?, Year = ?, Runtime = ?, Actors = ?, Notes = ?, '
+                        'title_key = ?, actors_key = ?, notes_key = ?, year_num = ?, runtime_num = ? WHERE pos = ?',
+                        values + [pos]
+                    )
+                elif op == 'add':
+                    first = conn.execute('SELECT COALESCE(MIN(pos), 0) FROM movies').fetchone()[0]
+                    conn.execute(
+                        'INSERT INTO movies (pos, ID, Title, Year, Runtime, Actors, Notes, '
+                        'title_key, actors_key, notes_key, year_num, runtime_num) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        [first - 1] + values
+                    )
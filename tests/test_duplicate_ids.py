@@ -0,0 +1,84 @@
+"""IDs on several rows: a delete removes all of them, an update only the first, in every storage mode."""
+import csv
+
+import pytest
+
+from journal import change, append_changes, read_changes, apply_changes
+from search_index import SearchIndex
+from sqlite_store import SqliteCatalog
+
+FIELDNAMES = ['ID', 'Title', 'Year', 'Runtime', 'Actors', 'Notes']
+MOVIES = [
+    {'ID': '1', 'Title': 'Heat', 'Year': '1995', 'Runtime': '170', 'Actors': 'Al Pacino', 'Notes': ''},
+    {'ID': '2', 'Title': 'Alien', 'Year': '1979', 'Runtime': '117', 'Actors': 'Sigourney Weaver', 'Notes': ''},
+    {'ID': '1', 'Title': 'Heat', 'Year': '1995', 'Runtime': '170', 'Actors': 'Al Pacino', 'Notes': 'copy'},
+    {'ID': '3', 'Title': 'Ran', 'Year': '1985', 'Runtime': '162', 'Actors': 'Tatsuya Nakadai', 'Notes': ''},
+    {'ID': '1', 'Title': 'Heat', 'Year': '1995', 'Runtime': '170', 'Actors': 'Al Pacino', 'Notes': 'another copy'},
+]
+
+
+def write_tsv(path, movies):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, delimiter='\t')
+        writer.writeheader()
+        writer.writerows(movies)
+
+
+def read_tsv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+
+def apply_in_tsv(tmp_path, changes):
+    # CATALOG_STORAGE=tsv: apply the changes and rewrite the TSV
+    tsv = tmp_path / 'Movies.tsv'
+    write_tsv(tsv, MOVIES)
+    write_tsv(tsv, apply_changes(read_tsv(tsv), changes))
+    return read_tsv(tsv)
+
+
+def apply_in_journal(tmp_path, changes):
+    # CATALOG_STORAGE=journal: append to the journal, replay it over the snapshot
+    tsv = tmp_path / 'Movies.tsv'
+    journal = str(tmp_path / 'Movies.journal')
+    write_tsv(tsv, MOVIES)
+    append_changes(changes, journal)
+    return apply_changes(read_tsv(tsv), read_changes(journal))
+
+
+def apply_in_sqlite(tmp_path, changes):
+    store = SqliteCatalog(str(tmp_path / 'Movies.db'))
+    store.replace_all(MOVIES)
+    store.apply(changes)
+    return store.all()
+
+
+STORAGE_MODES = pytest.mark.parametrize('apply', [apply_in_tsv, apply_in_journal, apply_in_sqlite],
+                                        ids=['tsv', 'journal', 'sqlite'])
+
+
+@STORAGE_MODES
+def test_delete_removes_every_row_with_the_id(tmp_path, apply):
+    remaining = apply(tmp_path, [change('delete', {'ID': '1'})])
+    assert [movie['ID'] for movie in remaining] == ['2', '3']
+
+
+@STORAGE_MODES
+def test_update_replaces_only_the_first_row_with_the_id(tmp_path, apply):
+    updated = dict(MOVIES[0], Notes='edited')
+    result = apply(tmp_path, [change('update', updated)])
+    assert [(movie['ID'], movie['Notes']) for movie in result] == [
+        ('1', 'edited'), ('2', ''), ('1', 'copy'), ('3', ''), ('1', 'another copy')]
+
+
+def test_search_index_drops_every_row_with_the_id():
+    index = SearchIndex()
+    index.rebuild(MOVIES, 1)
+    changes = [change('delete', {'ID': '1'})]
+    movies = apply_changes(MOVIES, changes)
+    index.apply_changes(changes, 1, 2)
+    # The change touches a duplicated ID, so the index declines and waits for a rebuild
+    assert index.version == 1
+    index.rebuild(movies, 2)
+    assert [movie['ID'] for movie in index.search(title='heat')] == []
+    assert [movie['ID'] for movie in index.search()] == ['2', '3']
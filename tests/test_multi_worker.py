@@ -0,0 +1,103 @@
+"""Two workers sharing one working directory and one Drive (benchmarks/fakes.FakeDrive)."""
+import csv
+import importlib.util
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fakes import FakeDrive
+import gdrive_helper
+from journal import change
+
+SEED = (b'ID\tTitle\tYear\tRuntime\tActors\tNotes\n'
+        b'1\tHeat\t1995\t170\tAl Pacino\t\n'
+        b'2\tAlien\t1979\t117\tSigourney Weaver\t\n')
+
+
+def movie(movie_id, title):
+    return {'ID': movie_id, 'Title': title, 'Year': '2000', 'Runtime': '90', 'Actors': '', 'Notes': ''}
+
+
+def load_worker(name):
+    # A second copy of app.py with its own caches, uploader and lock file handles,
+    # standing in for another gunicorn worker
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def drive_and_workers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('CATALOG_STORAGE', 'tsv')
+    monkeypatch.setenv('UPLOAD_DELAY', '60')
+    drive = FakeDrive(latency=0)
+    drive.install(gdrive_helper)
+    drive.put(gdrive_helper.DRIVE_FILE_ID, SEED)
+    workers = [load_worker('worker_a'), load_worker('worker_b')]
+    yield drive, workers
+    # Finish any scheduled upload while still in the temporary directory
+    for worker in workers:
+        assert worker.uploader.flush(30)
+    for name in ('worker_a', 'worker_b'):
+        sys.modules.pop(name, None)
+
+
+def drive_ids(drive):
+    data = drive.files[gdrive_helper.DRIVE_FILE_ID].decode('utf-8')
+    return {row['ID'] for row in csv.DictReader(io.StringIO(data), delimiter='\t')}
+
+
+def test_commits_from_two_workers_survive_a_drive_conflict(drive_and_workers):
+    drive, (a, b) = drive_and_workers
+    assert {m.ID for m in a.catalog.movies()} == {'1', '2'}
+
+    a.commit_changes([change('add', movie('10', 'From A'))])
+    # B reads the local files A just wrote instead of its own cached copy
+    b.commit_changes([change('add', movie('20', 'From B'))])
+    assert {m.ID for m in a.catalog.movies()} == {'1', '2', '10', '20'}
+
+    # Someone else changes Drive before either worker uploads
+    drive.put(gdrive_helper.DRIVE_FILE_ID, SEED + b'30\tExternal\t1990\t100\t\t\n')
+
+    assert a.uploader.flush(30)
+    assert a.uploader.status()['last_error'] is None
+    # A replayed the pending changes of both workers on top of Drive's copy
+    assert drive_ids(drive) == {'1', '2', '10', '20', '30'}
+    assert not a.has_pending_changes()
+    assert {m.ID for m in b.catalog.movies()} == {'1', '2', '10', '20', '30'}
+
+    # B has nothing left to send: Drive already has its change
+    uploads = drive.calls['upload']
+    assert b.upload_catalog() == a.sync_state.get('revision')
+    assert drive.calls['upload'] == uploads
+
+
+def test_saves_during_an_upload_stay_pending(drive_and_workers):
+    drive, (a, b) = drive_and_workers
+    a.catalog.movies()
+    a.commit_changes([change('add', movie('10', 'First'))])
+
+    # B saves while A's upload is between staging its copy and sending it
+    push_catalog = a.push_catalog
+
+    def push_with_concurrent_save(tsv_dirty):
+        b.commit_changes([change('add', movie('20', 'During upload'))])
+        return push_catalog(tsv_dirty)
+
+    a.push_catalog = push_with_concurrent_save
+    a.upload_catalog()
+    a.push_catalog = push_catalog
+
+    assert drive_ids(drive) == {'1', '2', '10'}
+    assert [record['ID'] for record in a.read_changes(a.PENDING_FILE)] == ['20']
+    a.upload_catalog()
+    assert drive_ids(drive) == {'1', '2', '10', '20'}
+    assert not a.has_pending_changes()
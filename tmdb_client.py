@@ -0,0 +1,113 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+# Requests per second allowed through the client, and how many may go out in a burst
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_BURST = int(os.getenv("TMDB_BURST", "20"))
+# (connect, read) timeouts in seconds
+TMDB_TIMEOUT = (float(os.getenv("TMDB_CONNECT_TIMEOUT", "3.05")), float(os.getenv("TMDB_READ_TIMEOUT", "10")))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "4"))
+TMDB_POOL_SIZE = int(os.getenv("TMDB_POOL_SIZE", "16"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Drain the bucket so nobody sends for the next `seconds` (after a 429)"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+            self._updated = time.monotonic()
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TMDBClient:
+    """Shared TMDB HTTP client: pooled keep-alive session, rate limiting and retries.
+
+    get() returns the final Response, so callers keep checking status_code as
+    before; network errors are re-raised once the retries are used up.
+    """
+
+    def __init__(self, api_key, base_url=TMDB_BASE_URL, rate=TMDB_RATE_LIMIT, burst=TMDB_BURST,
+                 timeout=TMDB_TIMEOUT, max_retries=TMDB_MAX_RETRIES, pool_size=TMDB_POOL_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.requests_sent = 0
+        self.retries = 0
+
+    def get(self, path, params=None):
+        url = self.base_url + path
+        params = dict(params or {}, api_key=self.api_key)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.requests_sent += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = _retry_after(response)
+                if response.status_code == 429:
+                    self.bucket.pause(delay if delay is not None else 1.0)
+
+            if delay is None:
+                # Exponential backoff with jitter: ~0.5s, 1s, 2s, ...
+                delay = 0.5 * (2 ** attempt) * (0.5 + random.random())
+            attempt += 1
+            self.retries += 1
+            time.sleep(delay)
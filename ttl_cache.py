@@ -0,0 +1,131 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry and an optional SQLite tier on disk.
+
+    The memory tier is per process; the disk tier (``disk_path``) is shared by
+    every gunicorn worker on the machine. Values must be JSON-serialisable.
+    Misses return None, so None itself can't be cached.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, disk_path=None, namespace='default', disk_maxsize=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.namespace = namespace
+        self.disk_path = disk_path
+        self.disk_maxsize = disk_maxsize or maxsize * 10
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._local = threading.local()
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS cache ('
+                    'namespace TEXT, key TEXT, expires REAL, value TEXT, PRIMARY KEY (namespace, key))'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (namespace, expires)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk_path:
+            try:
+                row = self._conn().execute(
+                    'SELECT expires, value FROM cache WHERE namespace = ? AND key = ? AND expires > ?',
+                    (self.namespace, key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print("TMDB cache read failed:", e)
+                row = None
+            if row is not None:
+                value = json.loads(row[1])
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, row[0], value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires, value)
+        if self.disk_path:
+            try:
+                conn = self._conn()
+                with conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO cache (namespace, key, expires, value) VALUES (?, ?, ?, ?)',
+                        (self.namespace, key, expires, json.dumps(value))
+                    )
+                self._disk_writes += 1
+                if self._disk_writes % 100 == 0:
+                    self._prune_disk()
+            except sqlite3.Error as e:
+                print("TMDB cache write failed:", e)
+
+    def _remember(self, key, expires, value):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        """Drop expired rows, then the soonest-to-expire ones beyond disk_maxsize"""
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM cache WHERE namespace = ? AND expires <= ?', (self.namespace, time.time()))
+            conn.execute(
+                'DELETE FROM cache WHERE namespace = ? AND key IN ('
+                'SELECT key FROM cache WHERE namespace = ? ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+                (self.namespace, self.namespace, self.disk_maxsize)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            conn = self._conn()
+            with conn:
+                conn.execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+            }